@@ -0,0 +1,465 @@
+"""
+Benchmarks for DerLungRLE utilities.
+
+Usage:
+    benchmark.py parallel [MAX_WORKERS]             decode scaling of transcode.decode_parallel() over worker counts,
+                                                    returning a copy and decoding into a caller-owned output block
+                                                    (transcode.decode_image() falls back to one process
+                                                    for more workers than CPUs)
+    benchmark.py suite [OUTPUT_JSON]                decode/encode throughput, peak memory and compression ratio
+                                                    of every path on a synthetic corpus (see corpus.py),
+                                                    including reading runs only (see rleimage.py);
+                                                    no peak memory for decode_parallel, its workers are untraced
+    benchmark.py compare BASE_JSON NEW_JSON         compare two suite results and flag regressions
+    benchmark.py startup                            time from interpreter start to the first decoded pixel
+                                                    and the slowest imports on the way (python -X importtime)
+    benchmark.py daemon [REQUESTS]                  latency and throughput of decoding small images through
+                                                    daemon.py compared to one transcode.py process per image
+    benchmark.py pack [IMAGES]                      decoding many small images from a pack file (see pack.py)
+                                                    compared to one loose file per image
+"""
+
+import transcode
+import corpus
+import rleimage
+import client
+import pack
+from sys import argv, exit
+from os import cpu_count, path
+from typing import Callable, Any
+from tempfile import TemporaryDirectory
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+
+
+
+SUITE_ARGV = 1
+REPEAT = 3 # timed runs per measurement, the fastest one counts
+PARALLEL_IMAGE_SHAPE = (8192, 4096) # (height, width) of synthetic image for parallel benchmark
+PARALLEL_MEAN_RUN = 4 # mean run length in pixels of synthetic image for parallel benchmark
+SUITE_SHAPE = (2048, 2048) # (height, width) of corpus images for suite benchmark
+PYTHON_MAX_PIXELS = 512 * 512 # corpus images are cropped to this for the (slow) reference decoder
+REGRESSION_THRESHOLD = 0.1 # relative throughput loss flagged as regression
+DAEMON_SHAPE = (64, 64) # (height, width) of corpus images decoded by daemon benchmark
+DAEMON_REQUESTS = 200 # decode requests per daemon benchmark path
+DAEMON_PROCESS_REQUESTS = 20 # decodes by separate transcode.py processes (which are a lot slower)
+DAEMON_START_TIMEOUT = 10.0 # seconds to wait for the daemon socket to show up
+PACK_IMAGES = 5000 # images per pack benchmark
+PACK_SHAPE = (32, 32) # (height, width) of corpus images packed by pack benchmark
+STARTUP_SHAPE = (256, 256) # (height, width) of corpus image decoded by startup benchmark
+STARTUP_TOP_IMPORTS = 10 # amount of slowest imports listed by startup benchmark
+STARTUP_IMPORT_DEPTH = 3 # nesting depth down to which imports are listed (1: imported by the script itself)
+# decodes the first block of rows of the image at argv[1] and prints its first pixel
+FIRST_PIXEL_SCRIPT = ("import sys, transcode; width, chunks = transcode.stream_image_data(sys.argv[1]); "
+                      "print(next(transcode.decode_stream(width, chunks))[0, 0], flush=True)")
+
+
+
+
+def synthetic_image(height: int, width: int, mean_run: float, seed: int = 0) -> np.ndarray[tuple[int, int], np.dtype[np.uint8]]:
+    """Return random grayscale image with geometrically distributed run lengths of given mean"""
+    rng = np.random.default_rng(seed)
+    pixel_count: int = height * width
+    lengths: np.ndarray = np.empty(0, dtype=np.int64)
+    while lengths.sum() < pixel_count:
+        lengths = np.concatenate((lengths, rng.geometric(1 / mean_run, size=int(pixel_count / mean_run) + 1)))
+    lengths = lengths[:np.searchsorted(np.cumsum(lengths), pixel_count) + 1]
+    colors: np.ndarray = rng.integers(0, 0b1_0000_0000, size=len(lengths), dtype=np.uint8)
+    return np.repeat(colors, lengths)[:pixel_count].reshape(height, width)
+
+
+
+def best_time(function: Callable, *args, repeat: int = REPEAT) -> tuple[float, Any]:
+    """Return fastest wall time in seconds of given amount of calls of function and output of the last call"""
+    times: list[float] = []
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        output: Any = function(*args)
+        times.append(time.perf_counter() - start)
+    return min(times), output
+
+
+
+def bench_parallel(max_workers: int | None = None) -> list[dict[str, float]]:
+    """
+    measures decode time of a synthetic image with transcode.decode_array()
+    and transcode.decode_parallel() with 2 to max_workers (number of CPUs by default) workers,
+    once returning a copy and once decoding into a caller-owned output block (see transcode.parallel_output());
+    the process pool is started before timing, as it is reused by every decode of a process
+
+    Return results as list of dicts containing worker count, CPU count, seconds (of the copy and of the caller-owned output),
+    MB/s of pixel data and speedup (of the caller-owned output)
+    """
+    max_workers = max_workers or cpu_count() or 1
+    data: bytes = transcode.encode(synthetic_image(*PARALLEL_IMAGE_SHAPE, PARALLEL_MEAN_RUN))
+    width: int = PARALLEL_IMAGE_SHAPE[1]
+    pixel_data: memoryview = memoryview(data)[transcode.STANDARD.HEADER_SIZE:]
+
+    baseline, expected = best_time(transcode.decode_array, width, pixel_data)
+    results: list[dict[str, float]] = [{"workers": 1, "cpus": cpu_count() or 1, "seconds": baseline, "owned_seconds": baseline}]
+    with transcode.parallel_output(expected.size) as output:
+        for workers in range(2, max_workers + 1):
+            transcode.get_parallel_pool(workers)
+            seconds, pixels = best_time(transcode.decode_parallel, width, pixel_data, workers)
+            assert np.array_equal(pixels, expected)
+            owned_seconds, pixels = best_time(lambda: transcode.decode_parallel(width, pixel_data, workers, output=output))
+            assert np.array_equal(pixels, expected)
+            del pixels # release output block before it is closed
+            results.append({"workers": workers, "cpus": cpu_count() or 1, "seconds": seconds, "owned_seconds": owned_seconds})
+
+    for result in results:
+        result["mb_per_s"] = len(pixel_data) / result["owned_seconds"] / 1e6
+        result["speedup"] = baseline / result["owned_seconds"]
+    return results
+
+
+
+def peak_memory(function: Callable, *args) -> int:
+    """Return peak amount of bytes allocated (Python objects and NumPy arrays) during a call of function"""
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+
+def stream_decode(image_width: int, pixel_data) -> None:
+    """decodes pixel data with transcode.decode_stream(), dropping the rows"""
+    for _ in transcode.decode_stream(image_width, transcode.split_chunks(pixel_data)):
+        pass
+
+
+
+def mapped_decode(image_path) -> np.ndarray:
+    """decodes image file through a memory map"""
+    with transcode.open_image_data(image_path) as image_data:
+        return transcode.decode_array(*image_data.values())
+
+
+
+def decode_paths(workers: int) -> dict[str, Callable]:
+    """Return decode functions taking (image width, pixel data) by benchmark path name"""
+    return {
+        "decode_python": transcode.decode,
+        "decode_numpy": transcode.decode_array,
+        "decode_stream": stream_decode,
+        "decode_runs": rleimage.RLEImage.from_pixel_data,
+        "decode_parallel": lambda image_width, pixel_data: transcode.decode_parallel(image_width, pixel_data, workers)
+    }
+
+
+
+def measure(profile: str, bench_path: str, function: Callable, args: tuple, pixels: int, size: int,
+            traced: bool = True) -> dict[str, Any]:
+    """
+    Return result dict of a benchmark path on a corpus image of given amount of pixels and encoded size in bytes
+    (header included), peak memory is None unless traced
+    """
+    seconds, _ = best_time(function, *args)
+    return {
+        "profile": profile,
+        "path": bench_path,
+        "pixels": pixels,
+        "bytes": size,
+        "ratio": pixels / size,
+        "seconds": seconds,
+        "mb_per_s": size / seconds / 1e6,
+        "pixels_per_s": pixels / seconds,
+        "peak_bytes": peak_memory(function, *args) if traced else None
+    }
+
+
+
+def bench_suite(shape: tuple[int, int] = SUITE_SHAPE, workers: int | None = None) -> dict[str, Any]:
+    """
+    measures every decode and encode path on each image of a synthetic corpus (see corpus.py)
+
+    Return dict containing "meta" (environment) and "results" (list of result dicts as returned by measure())
+    """
+    workers = workers or cpu_count() or 1
+    results: list[dict[str, Any]] = []
+    with TemporaryDirectory() as directory:
+        for image_path in corpus.write_corpus(directory, shape[1], shape[0]):
+            profile: str = path.splitext(path.basename(image_path))[0]
+            with open(image_path, "rb") as file:
+                data: bytes = file.read()
+            image_width: int = int.from_bytes(data[:transcode.STANDARD.HEADER_SIZE], "big")
+            pixel_data: memoryview = memoryview(data)[transcode.STANDARD.HEADER_SIZE:]
+            pixels: np.ndarray = transcode.decode_array(image_width, pixel_data)
+
+            for bench_path, function in decode_paths(workers).items():
+                if bench_path == "decode_python":
+                    # reference decoder on a prefix of the pixel data only
+                    prefix: bytes = bytes(pixel_data[:len(pixel_data) * PYTHON_MAX_PIXELS // pixels.size])
+                    prefix_pixels: int = int(transcode.scan_runs(prefix)[1].sum())
+                    results.append(measure(profile, bench_path, function, (image_width, prefix), prefix_pixels,
+                                           transcode.STANDARD.HEADER_SIZE + len(prefix)))
+                    continue
+                # tracemalloc only sees the parent process, not the worker processes doing the decoding
+                results.append(measure(profile, bench_path, function, (image_width, pixel_data), pixels.size, len(data),
+                                       traced=bench_path != "decode_parallel"))
+            results.append(measure(profile, "decode_mapped", mapped_decode, (image_path,), pixels.size, len(data)))
+            results.append(measure(profile, "encode", transcode.encode, (pixels,), pixels.size, len(transcode.encode(pixels))))
+
+    return {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpus": cpu_count(),
+            "workers": workers,
+            "shape": shape
+        },
+        "results": results
+    }
+
+
+
+def run_startup(*args: str) -> tuple[float, str]:
+    """
+    runs the Python interpreter with given arguments in the directory of this script
+
+    Return wall time in seconds until the first line of stdout and the complete stderr output
+    """
+    start: float = time.perf_counter()
+    process = subprocess.Popen((sys.executable, *args), cwd=path.dirname(path.abspath(__file__)),
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    process.stdout.readline()
+    seconds: float = time.perf_counter() - start
+    _, errors = process.communicate()
+    return seconds, errors
+
+
+
+def parse_importtime(output: str, depth: int = STARTUP_IMPORT_DEPTH) -> dict[str, float]:
+    """Return cumulative import time in seconds by module of -X importtime output, for imports up to given nesting depth"""
+    imports: dict[str, float] = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line.split("|")
+        if (len(module) - len(module.lstrip()) - 1) // 2 + 1 <= depth:
+            imports[module.strip()] = int(cumulative) / 1e6
+    return imports
+
+
+
+def bench_startup(shape: tuple[int, int] = STARTUP_SHAPE, top: int = STARTUP_TOP_IMPORTS) -> list[dict[str, Any]]:
+    """
+    measures the time from interpreter start to the first decoded pixel of a small corpus image
+    in a fresh process, compared to a bare interpreter start, and the slowest imports on the way
+
+    Return results as list of dicts containing measurement name and seconds
+    """
+    with TemporaryDirectory() as directory:
+        image_path: str = path.join(directory, "startup.bin")
+        with open(image_path, "wb") as file:
+            file.write(corpus.generate("short_runs", shape[1], shape[0]))
+
+        interpreter: float = min(run_startup("-c", "print()")[0] for _ in range(REPEAT))
+        runs: list[tuple[float, str]] = [run_startup("-X", "importtime", "-c", FIRST_PIXEL_SCRIPT, image_path)
+                                         for _ in range(REPEAT)]
+    first_pixel, importtime = min(runs)
+
+    imports: dict[str, float] = parse_importtime(importtime)
+    results: list[dict[str, Any]] = [
+        {"measurement": "interpreter start", "seconds": interpreter},
+        {"measurement": "first pixel", "seconds": first_pixel}
+    ]
+    results.extend({"measurement": f"import {module}", "seconds": seconds}
+                   for module, seconds in sorted(imports.items(), key=lambda item: item[1], reverse=True)[:top])
+    return results
+
+
+
+def latency_result(bench_path: str, latencies: list[float]) -> dict[str, Any]:
+    """Return result dict of given request latencies in seconds: mean, median, 99th percentile and requests per second"""
+    return {
+        "path": bench_path,
+        "requests": len(latencies),
+        "mean_ms": float(np.mean(latencies)) * 1e3,
+        "p50_ms": float(np.percentile(latencies, 50)) * 1e3,
+        "p99_ms": float(np.percentile(latencies, 99)) * 1e3,
+        "requests_per_s": len(latencies) / sum(latencies)
+    }
+
+
+
+def bench_daemon(requests: int = DAEMON_REQUESTS, shape: tuple[int, int] = DAEMON_SHAPE) -> list[dict[str, Any]]:
+    """
+    measures latency of decoding small corpus images (one per profile, requested in turns)
+    through a daemon.py process (by path, cold and warm cache, and inline payload)
+    and by one transcode.py process per image (decoding to a raw file)
+
+    Return results as list of dicts as returned by latency_result()
+    """
+    results: list[dict[str, Any]] = []
+    script_directory: str = path.dirname(path.abspath(__file__))
+    with TemporaryDirectory() as directory:
+        image_paths: list[str] = corpus.write_corpus(directory, shape[1], shape[0])
+        payloads: list[bytes] = []
+        for image_path in image_paths:
+            with open(image_path, "rb") as file:
+                payloads.append(file.read())
+        socket_path: str = path.join(directory, "daemon.sock")
+        daemon = subprocess.Popen((sys.executable, "daemon.py", socket_path), cwd=script_directory)
+        try:
+            deadline: float = time.perf_counter() + DAEMON_START_TIMEOUT
+            while not path.exists(socket_path):
+                assert time.perf_counter() < deadline, "daemon didn't start"
+                time.sleep(0.01)
+
+            with client.Client(socket_path) as daemon_client:
+                for bench_path, arguments in (
+                    ("daemon_path_cold", lambda request: (image_paths[request % len(image_paths)],)),
+                    ("daemon_path_warm", lambda request: (image_paths[request % len(image_paths)],)),
+                    ("daemon_payload", lambda request: (None, payloads[request % len(payloads)]))
+                ):
+                    latencies: list[float] = []
+                    for request in range(requests if bench_path != "daemon_path_cold" else len(image_paths)):
+                        start: float = time.perf_counter()
+                        daemon_client.decode(*arguments(request))
+                        latencies.append(time.perf_counter() - start)
+                    results.append(latency_result(bench_path, latencies))
+        finally:
+            daemon.terminate()
+            daemon.wait()
+
+        latencies = []
+        for request in range(DAEMON_PROCESS_REQUESTS):
+            start = time.perf_counter()
+            subprocess.run((sys.executable, "transcode.py", "-d", image_paths[request % len(image_paths)],
+                            path.join(directory, "out.raw")), cwd=script_directory, check=True)
+            latencies.append(time.perf_counter() - start)
+        results.append(latency_result("process", latencies))
+    return results
+
+
+
+def decode_loose(image_paths: list[str], mapped: bool) -> None:
+    """decodes every image file at given paths, opening each of them"""
+    for image_path in image_paths:
+        with transcode.open_image_data(image_path, mapped) as image_data:
+            transcode.decode_array(*image_data.values())
+
+
+
+def decode_packed(pack_path) -> None:
+    """decodes every image of pack file at given path"""
+    for _ in transcode.iter_pack(pack_path):
+        pass
+
+
+
+def open_pack(pack_path) -> None:
+    """opens pack file at given path (reading its index) and closes it again"""
+    pack.Pack(pack_path, transcode.LANG).close()
+
+
+
+def bench_pack(images: int = PACK_IMAGES, shape: tuple[int, int] = PACK_SHAPE) -> list[dict[str, Any]]:
+    """
+    measures decoding of many small corpus images (short_runs profile) from loose files (read and memory-mapped)
+    and from a pack file of the same images, as well as opening the pack (reading its index) alone
+
+    Return results as list of dicts
+    """
+    results: list[dict[str, Any]] = []
+    with TemporaryDirectory() as directory:
+        image_paths: list[str] = []
+        for image in range(images):
+            image_paths.append(path.join(directory, f"{image}.bin"))
+            with open(image_paths[-1], "wb") as file:
+                file.write(corpus.generate("short_runs", shape[1], shape[0], seed=image))
+        pack_path: str = path.join(directory, "images" + pack.EXTENSION)
+        pack.build_pack(pack_path, image_paths, transcode.LANG)
+
+        for bench_path, function, args in (
+            ("loose_read", decode_loose, (image_paths, False)),
+            ("loose_mapped", decode_loose, (image_paths, True)),
+            ("pack", decode_packed, (pack_path,)),
+            ("pack_open", open_pack, (pack_path,))
+        ):
+            seconds, _ = best_time(function, *args)
+            results.append({
+                "path": bench_path,
+                "images": images,
+                "seconds": seconds,
+                "images_per_s": images / seconds,
+                "us_per_image": seconds / images * 1e6
+            })
+    return results
+
+
+
+def compare(base: dict[str, Any], new: dict[str, Any], threshold: float = REGRESSION_THRESHOLD) -> list[dict[str, Any]]:
+    """
+    compares pixel throughput of two suite results per profile and path
+
+    Return comparison as list of dicts containing profile, path, both throughputs, relative change and regression flag
+    """
+    base_results: dict[tuple[str, str], dict[str, Any]] = {(result["profile"], result["path"]): result for result in base["results"]}
+    comparison: list[dict[str, Any]] = []
+    for result in new["results"]:
+        key: tuple[str, str] = (result["profile"], result["path"])
+        if key not in base_results:
+            continue
+        change: float = result["pixels_per_s"] / base_results[key]["pixels_per_s"] - 1
+        comparison.append({
+            "profile": key[0],
+            "path": key[1],
+            "base_pixels_per_s": base_results[key]["pixels_per_s"],
+            "new_pixels_per_s": result["pixels_per_s"],
+            "change": change,
+            "regression": change < -threshold
+        })
+    return comparison
+
+
+
+def print_table(results: list[dict[str, float]]) -> None:
+    """prints list of result dicts as aligned table"""
+    columns: list[str] = list(results[0].keys())
+    print("".join(f"{column:>16}" for column in columns))
+    for result in results:
+        print("".join(f"{result[column]:>16.3f}" if isinstance(result[column], float) else f"{result[column]!s:>16}"
+                      for column in columns))
+
+
+
+
+
+
+if __name__ == "__main__":
+    match argv[SUITE_ARGV] if len(argv) > SUITE_ARGV else None:
+        case "parallel":
+            print_table(bench_parallel(int(argv[SUITE_ARGV + 1]) if len(argv) > SUITE_ARGV + 1 else None))
+        case "suite":
+            suite: dict[str, Any] = bench_suite()
+            print_table(suite["results"])
+            if len(argv) > SUITE_ARGV + 1:
+                with open(argv[SUITE_ARGV + 1], "w", encoding="utf-8") as file:
+                    json.dump(suite, file, indent=2)
+        case "compare":
+            with open(argv[SUITE_ARGV + 1], encoding="utf-8") as base_file, open(argv[SUITE_ARGV + 2], encoding="utf-8") as new_file:
+                comparison: list[dict[str, Any]] = compare(json.load(base_file), json.load(new_file))
+            print_table(comparison)
+            if any(entry["regression"] for entry in comparison):
+                exit(1)
+        case "daemon":
+            print_table(bench_daemon(int(argv[SUITE_ARGV + 1]) if len(argv) > SUITE_ARGV + 1 else DAEMON_REQUESTS))
+        case "startup":
+            print_table(bench_startup())
+        case "pack":
+            print_table(bench_pack(int(argv[SUITE_ARGV + 1]) if len(argv) > SUITE_ARGV + 1 else PACK_IMAGES))
+        case _:
+            print(__doc__)
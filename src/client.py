@@ -0,0 +1,148 @@
+"""
+Thin client of the DerLungRLE daemon (see daemon.py) and the length-prefixed protocol both use.
+Only needs the standard library, so it starts fast.
+
+Every message is a prefix of two big-endian integers (length of the header, length of the payload),
+followed by the header (UTF-8 JSON object) and the payload (raw bytes).
+
+Requests (header fields; the payload replaces "path" if it is omitted):
+    {"op": "decode", "path": ...}                       payload: DerLungRLE file data
+    {"op": "encode", "path": ..., "optimize": false}    payload: raw pixels, header needs "width" and "height"
+    {"op": "info", "path": ...}                         payload: DerLungRLE file data
+Responses:
+    {"ok": true, "width": ..., "height": ..., ...}      payload: raw pixels (decode) or file data (encode)
+    {"ok": false, "error": ...}
+
+Usage:
+    client.py SOCKET decode INPUTFILE OUTPUTFILE        write raw pixels (row by row, one byte per pixel)
+    client.py SOCKET encode INPUTFILE OUTPUTFILE [--optimize]
+    client.py SOCKET info INPUTFILE
+"""
+
+from sys import argv, exit, stderr
+from os import path
+from typing import Any
+import json
+import socket
+import struct
+
+
+
+
+PREFIX = struct.Struct(">IQ") # header length, payload length
+SOCKET_ARGV = 1
+OPERATION_ARGV = 2
+INPUT_PATH_ARGV = 3
+OUTPUT_PATH_ARGV = 4
+OPTIMIZE_ARGV_OPTION = "--optimize"
+
+
+
+
+class DaemonError(Exception):
+    """error reported by the daemon in response to a request"""
+
+
+
+def pack_message(header: dict[str, Any], payload: bytes | memoryview = b"") -> list[bytes | memoryview]:
+    """Return parts of a protocol message with given header and payload (to be sent in order)"""
+    header_data: bytes = json.dumps(header).encode("utf-8")
+    return [PREFIX.pack(len(header_data), len(payload)), header_data, payload]
+
+
+
+def receive_exactly(connection: socket.socket, size: int) -> bytearray:
+    """Return exactly size bytes received from given socket; raise ConnectionError if it's closed before"""
+    data: bytearray = bytearray(size)
+    view: memoryview = memoryview(data)
+    received: int = 0
+    while received < size:
+        amount: int = connection.recv_into(view[received:])
+        if amount == 0:
+            raise ConnectionError("connection closed by daemon")
+        received += amount
+    return data
+
+
+
+class Client:
+    """connection to a DerLungRLE daemon that can be used for any amount of requests"""
+    def __init__(self, socket_path: str) -> None:
+        self.connection: socket.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.connection.connect(socket_path)
+
+
+    def request(self, header: dict[str, Any], payload: bytes | memoryview = b"") -> tuple[dict[str, Any], bytearray]:
+        """
+        sends request with given header and payload and waits for the response
+
+        Return response header and payload
+
+        Raise DaemonError if the daemon couldn't handle the request
+        """
+        for part in pack_message(header, payload):
+            self.connection.sendall(part)
+        header_size, payload_size = PREFIX.unpack(receive_exactly(self.connection, PREFIX.size))
+        response: dict[str, Any] = json.loads(receive_exactly(self.connection, header_size))
+        response_payload: bytearray = receive_exactly(self.connection, payload_size)
+        if not response["ok"]:
+            raise DaemonError(response["error"])
+        return response, response_payload
+
+
+    def decode(self, image_path: str | None = None, data: bytes | memoryview = b"") -> tuple[int, int, bytearray]:
+        """Return width, height and raw pixels of DerLungRLE file at given path (or given file data)"""
+        header, pixels = self.request({"op": "decode", "path": image_path}, data)
+        return header["width"], header["height"], pixels
+
+
+    def encode(self, image_path: str | None = None, pixels: bytes | memoryview = b"", width: int = 0, height: int = 0,
+               optimize: bool = False) -> bytearray:
+        """Return DerLungRLE file data of image file at given path (or given raw pixels of given size)"""
+        request: dict[str, Any] = {"op": "encode", "path": image_path, "width": width, "height": height, "optimize": optimize}
+        return self.request(request, pixels)[1]
+
+
+    def info(self, image_path: str | None = None, data: bytes | memoryview = b"") -> dict[str, Any]:
+        """Return scan result (see transcode.scan_structure()) of DerLungRLE file at given path (or given file data)"""
+        header, _ = self.request({"op": "info", "path": image_path}, data)
+        del header["ok"]
+        return header
+
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+    def __enter__(self) -> "Client":
+        return self
+
+
+    def __exit__(self, *exception) -> None:
+        self.close()
+
+
+
+
+
+
+if __name__ == "__main__":
+    if len(argv) <= INPUT_PATH_ARGV or argv[OPERATION_ARGV] not in ("decode", "encode", "info"):
+        print(__doc__)
+        exit(1)
+    try:
+        with Client(argv[SOCKET_ARGV]) as client:
+            input_path: str = path.abspath(argv[INPUT_PATH_ARGV])
+            match argv[OPERATION_ARGV]:
+                case "decode":
+                    output: bytes | bytearray = client.decode(input_path)[2]
+                case "encode":
+                    output = client.encode(input_path, optimize=OPTIMIZE_ARGV_OPTION in argv)
+                case _:
+                    print(json.dumps(client.info(input_path)))
+                    exit(0)
+        with open(argv[OUTPUT_PATH_ARGV], "wb") as file:
+            file.write(output)
+    except (OSError, DaemonError, IndexError) as ex:
+        print(repr(ex), file=stderr)
+        exit(1)
@@ -0,0 +1,94 @@
+"""
+Synthetic corpus of DerLungRLE images with controlled size, width and run length distribution.
+
+Usage:
+    corpus.py OUTPUTDIR [WIDTH HEIGHT]      write one image per profile to OUTPUTDIR
+"""
+
+from definitions.standard import DerLungRLE
+import definitions.lang as lang
+from sys import argv
+from os import path
+import numpy as np
+
+
+
+
+STANDARD = DerLungRLE(lang.EnglishUS)
+DEFAULT_SHAPE = (1024, 1024) # (height, width)
+# run length distribution of each profile: (minimum run length, maximum run length)
+PROFILES: dict[str, tuple[int, int]] = {
+    "singletons": (1, 1), # only bare color bytes
+    "short_runs": (1, 8),
+    "long_runs": (100, STANDARD.MAX_PXCOUNT),
+    "cross_rows": (STANDARD.MAX_PXCOUNT // 2, STANDARD.MAX_PXCOUNT), # runs longer than narrow rows
+    "truncated": (1, 32) # last row is only half defined
+}
+CROSS_ROWS_WIDTH = 37 # narrow width for the cross_rows profile, so most runs wrap into the next row
+# pxcount bytes of all run lengths, index with run length
+PXCOUNT_LUT: np.ndarray = np.array([STANDARD.to_pxcount(count) for count in range(STANDARD.MAX_PXCOUNT + 1)], dtype=np.uint8)
+
+
+
+
+def generate(profile: str, width: int, height: int, seed: int = 0) -> bytes:
+    """
+    generates DerLungRLE file data of an image of given size whose runs follow the distribution of given profile;
+    every run has a different color than the one before it, so run lengths survive decoding
+
+    Return file data (header and pixel data)
+    """
+    low, high = PROFILES[profile]
+    rng = np.random.default_rng(seed)
+    pixel_count: int = width * height - (width // 2 if profile == "truncated" else 0)
+
+    lengths: np.ndarray = rng.integers(low, high + 1, size=pixel_count // low + 1)
+    run_count: int = int(np.searchsorted(np.cumsum(lengths), pixel_count)) + 1
+    lengths = lengths[:run_count]
+    lengths[-1] -= lengths.sum() - pixel_count # cut last run to pixel count
+    # random walk over colors that never stays on the same color
+    colors: np.ndarray = np.cumsum(rng.integers(1, STANDARD.MAX_PXCOUNT + 1, size=run_count)) % (STANDARD.MAX_PXCOUNT + 1)
+
+    # pxcount byte (if run is longer than one pixel) followed by color byte
+    sizes: np.ndarray = np.where(lengths > 1, 2, 1)
+    ends: np.ndarray = np.cumsum(sizes)
+    pixel_data: np.ndarray = np.empty(ends[-1], dtype=np.uint8)
+    pixel_data[ends[lengths > 1] - 2] = PXCOUNT_LUT[lengths[lengths > 1]]
+    pixel_data[ends - 1] = colors
+    return STANDARD.encode_width(width) + pixel_data.tobytes()
+
+
+
+def profile_width(profile: str, width: int) -> int:
+    """Return width an image of given profile is generated with"""
+    return CROSS_ROWS_WIDTH if profile == "cross_rows" else width
+
+
+
+def write_corpus(directory, width: int = DEFAULT_SHAPE[1], height: int = DEFAULT_SHAPE[0]) -> list[str]:
+    """
+    writes one image per profile with about width x height pixels to given directory
+
+    Return paths of written files
+    """
+    paths: list[str] = []
+    for profile in PROFILES:
+        profile_height: int = width * height // profile_width(profile, width)
+        file_path: str = path.join(directory, f"{profile}.bin")
+        with open(file_path, "wb") as file:
+            file.write(generate(profile, profile_width(profile, width), profile_height))
+        paths.append(file_path)
+    return paths
+
+
+
+
+
+
+if __name__ == "__main__":
+    if len(argv) < 2:
+        print(__doc__)
+    else:
+        shape: tuple[int, int] = (int(argv[3]), int(argv[2])) if len(argv) > 3 else DEFAULT_SHAPE
+        for file_path in write_corpus(argv[1], shape[1], shape[0]):
+            print(file_path)
@@ -0,0 +1,162 @@
+"""
+Long-running DerLungRLE daemon: decodes, encodes and describes images on request over a Unix domain socket,
+so requests don't pay for interpreter startup and imports and hot files are served from a warm cache.
+See client.py for the protocol and a thin client.
+
+Usage:
+    daemon.py SOCKET [--workers WORKERS] [--disk-cache DIRECTORY [--disk-cache-size MEGABYTES]]
+        listen on SOCKET (path of a Unix domain socket) until interrupted,
+        optionally sharing decoded images with other processes through a disk cache (see transcode.py --help)
+"""
+
+import transcode
+import client
+from sys import argv, exit
+from os import path, remove, lstat, cpu_count
+from typing import Any
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+import logging
+import signal
+import stat
+import numpy as np
+
+
+
+
+SOCKET_ARGV = 1
+WORKERS_ARGV_OPTION = transcode.WORKERS_ARGV_OPTION
+
+
+
+
+def decode_request(header: dict[str, Any], payload: bytes) -> tuple[dict[str, Any], bytes | memoryview]:
+    """handles decode request; files are cached by path, modification time and size, payloads by digest"""
+    if header.get("path") is not None:
+        pixels: np.ndarray = transcode.load_image(header["path"])
+    else:
+        assert len(payload) >= transcode.STANDARD.HEADER_SIZE + 1, transcode.LANG.Error.FILE_TOO_SHORT
+        image_width: int = int.from_bytes(payload[:transcode.STANDARD.HEADER_SIZE], "big")
+        assert image_width > 0, transcode.LANG.Error.WIDTH_ZERO
+        pixels = transcode.decode_image(image_width, memoryview(payload)[transcode.STANDARD.HEADER_SIZE:], cached=True)
+    return {"width": pixels.shape[1], "height": pixels.shape[0]}, memoryview(pixels).cast("B")
+
+
+
+def encode_request(header: dict[str, Any], payload: bytes) -> tuple[dict[str, Any], bytes]:
+    """handles encode request of an image file (any format supported by Pillow) or raw pixels"""
+    if header.get("path") is not None:
+        from PIL import Image
+
+        with Image.open(header["path"]) as image:
+            image.load()
+    else:
+        assert len(payload) == header["width"] * header["height"], transcode.LANG.Error.INVALID_IMAGE_SHAPE
+        image = np.frombuffer(payload, dtype=np.uint8).reshape(header["height"], header["width"])
+    data: bytes = transcode.encode(image, bool(header.get("optimize", False)))
+    return {"bytes": len(data)}, data
+
+
+
+def info_request(header: dict[str, Any], payload: bytes) -> tuple[dict[str, Any], bytes]:
+    """handles metadata request: scan result of transcode.scan_structure() (without decoding)"""
+    if header.get("path") is not None:
+        with transcode.open_image_data(header["path"]) as image_data:
+            result: dict[str, Any] = transcode.scan_structure(*image_data.values())
+    else:
+        assert len(payload) >= transcode.STANDARD.HEADER_SIZE + 1, transcode.LANG.Error.FILE_TOO_SHORT
+        image_width: int = int.from_bytes(payload[:transcode.STANDARD.HEADER_SIZE], "big")
+        assert image_width > 0, transcode.LANG.Error.WIDTH_ZERO
+        result = transcode.scan_structure(image_width, memoryview(payload)[transcode.STANDARD.HEADER_SIZE:])
+    return {**result, "histogram": result["histogram"].tolist()}, b""
+
+
+
+HANDLERS = {
+    "decode": decode_request,
+    "encode": encode_request,
+    "info": info_request
+}
+
+
+
+def handle_request(header: dict[str, Any], payload: bytes) -> tuple[dict[str, Any], bytes | memoryview]:
+    """
+    handles request with given header and payload; runs in the executor pool
+
+    Return response header and payload (errors are reported in the header instead of raised)
+    """
+    try:
+        assert header.get("op") in HANDLERS, f"unknown operation {header.get('op')!r}"
+        response, data = HANDLERS[header["op"]](header, payload)
+        return {"ok": True, **response}, data
+    except Exception as ex:
+        logging.exception(ex)
+        return {"ok": False, "error": str(ex) or repr(ex)}, b""
+
+
+
+async def serve_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, executor: ThreadPoolExecutor) -> None:
+    """answers requests of a client connection in order until the client disconnects"""
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            try:
+                header_size, payload_size = client.PREFIX.unpack(await reader.readexactly(client.PREFIX.size))
+            except asyncio.IncompleteReadError:
+                return # client disconnected
+            header: dict[str, Any] = json.loads(await reader.readexactly(header_size))
+            payload: bytes = await reader.readexactly(payload_size)
+            logging.debug(f"request {header} with {payload_size}B payload")
+
+            response, data = await loop.run_in_executor(executor, handle_request, header, payload)
+            writer.writelines(client.pack_message(response, data))
+            await writer.drain()
+    except (ConnectionError, json.JSONDecodeError) as ex:
+        logging.warning(f"dropping connection: {ex!r}")
+    finally:
+        writer.close()
+
+
+
+async def serve(socket_path: str, workers: int) -> None:
+    """
+    listens on Unix domain socket at given path until cancelled (or terminated by SIGTERM),
+    running CPU work in given amount of threads
+    """
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    if path.exists(socket_path) and stat.S_ISSOCK(lstat(socket_path).st_mode):
+        remove(socket_path) # left over by a daemon that didn't shut down cleanly
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        server = await asyncio.start_unix_server(lambda reader, writer: serve_connection(reader, writer, executor), socket_path)
+        logging.info(f"listening on {socket_path} with {workers} workers")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            logging.debug(f"image cache: {transcode.IMAGE_CACHE.stats()}")
+            if transcode.DISK_CACHE is not None:
+                logging.debug(f"disk cache: {transcode.DISK_CACHE.stats()}")
+            if path.exists(socket_path):
+                remove(socket_path)
+
+
+
+
+
+
+if __name__ == "__main__":
+    if len(argv) <= SOCKET_ARGV or argv[SOCKET_ARGV].startswith("-"):
+        print(__doc__)
+        exit(1)
+    transcode.setup_logging()
+    transcode.set_language(transcode.get_language())
+    transcode.DISK_CACHE = transcode.handle_critical_exception(transcode.get_disk_cache, exception=AssertionError)
+    workers: int = (transcode.handle_critical_exception(transcode.get_workers, exception=AssertionError)
+                    if WORKERS_ARGV_OPTION in argv else cpu_count() or 1)
+    try:
+        asyncio.run(serve(argv[SOCKET_ARGV], workers))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        logging.info("Exiting with status code 0.")
@@ -26,6 +26,18 @@ class LanguagePack():
         """info messages"""
         TRANSCODE_HELP: str
         VIEWER_HELP: tuple[str, str]
+        BATCH_FILE_DONE: str
+        BATCH_FILE_FAILED: str
+        BATCH_SUMMARY: str
+        ENCODE_SIZE: str
+        INFO_SUMMARY: str
+        INFO_HISTOGRAM: str
+        INFO_ANOMALIES: str
+        VERIFY_VALID: str
+        VERIFY_INVALID: str
+        PACK_BUILT: str
+        PACK_MEMBER: str
+        PACK_EXTRACTED: str
 
     class Error:
         """error messages"""
@@ -39,6 +51,20 @@ class LanguagePack():
         INVALID_MODE: str
         INVALID_INPUT_PATH: str
         INVALID_OUTPUT_PATH: str
+        INVALID_ENGINE: str
+        INVALID_WORKERS: str
+        INVALID_ROWS: str
+        NO_INPUT_FILES: str
+        INVALID_EXPORT_FORMAT: str
+        IMAGE_NOT_DECODED: tuple[str, str]
+        INVALID_IMAGE_SHAPE: str
+        IMAGE_EMPTY: str
+        WIDTH_MISMATCH: str
+        INVALID_PACK: str
+        PACK_MEMBER_NOT_FOUND: str
+        DUPLICATE_PACK_MEMBER: str
+        DUPLICATE_OUTPUT_PATH: str
+        INVALID_CACHE_SIZE: str
         IMAGE_TOO_SMALL_TO_DISPLAY: tuple[str, str]
 
 
@@ -71,19 +97,66 @@ class EnglishUS(LanguagePack):
         TRANSCODE_HELP = """
 Usage:
     transcode.py MODE INPUTFILE [OUTPUTFILE] [OPTIONS]
+    transcode.py BATCHMODE INPUTFILES... [OPTIONS]
+    transcode.py PACKMODE PACKFILE [INPUTFILES... | IMAGES...] [OPTIONS]
 Modes:
-    -d  --decode    decode INPUTFILE and print pixels to stdout
+    -d  --decode    decode INPUTFILE and print pixels to stdout or export them to OUTPUTFILE
+                    (pgm, raw and npy are written while decoding, bin is re-encoded once decoded, other formats via Pillow)
     -e  --encode    encode OUTPUTFILE (out.bin in same directory as INPUTFILE by default) from INPUTFILE
+    -bd --batch-decode  decode all INPUTFILES (paths, directories or glob patterns) and export them as images
+    -be --batch-encode  encode all INPUTFILES (paths, directories or glob patterns)
+    -i  --info      print size, padding, compression ratio, run length histogram and anomalies of all INPUTFILES
+                    (scanned without decoding)
+    -v  --verify    check all INPUTFILES for anomalies (pxcounts of 0, consecutive pxcounts, trailing pxcount),
+                    exit with status code 1 if any is found
+    -pb --pack-build    pack all INPUTFILES (paths, directories or glob patterns) into PACKFILE
+    -pl --pack-list     list the images in PACKFILE
+    -px --pack-extract  extract IMAGES (all by default) from PACKFILE as DerLungRLE files
+    -pd --pack-decode   decode IMAGES (all by default) from PACKFILE and export them as images
     -?  --help      show this message
 Options:
     --lang      PARAMETER: language code (ISO 639-1), changes language of program
+    --engine    PARAMETER: decode engine ('numpy' (default) or 'python' reference implementation)
+    --workers   PARAMETER: amount of worker processes decoding a file in parallel (numpy engine, default: 1)
+                or transcoding files in batch modes (default: number of CPUs)
+    --out       PARAMETER: output directory of batch modes (default: directory of each INPUTFILE)
+                and pack extract/decode modes (default: directory of PACKFILE)
+    --format    PARAMETER: image format (file extension) of files exported in batch and pack decode modes (default: png)
+                or in decode mode (default: extension of OUTPUTFILE, pgm for stdout)
+    -           as INPUTFILE or OUTPUTFILE: read from stdin or write to stdout
+    --rows      PARAMETER: decode mode: decode only rows START:STOP (end exclusive), reading only the pixel data they need
+                via a row index (saved next to INPUTFILE as INPUTFILE.idx)
+    --fit           decode mode: downscale image to fit into the terminal
+    --half-blocks   decode mode: print two rows of pixels per line using half block characters
+    --shading       decode mode: print grayscale shades instead of black/white only
+    --optimize      encode modes: minimize file size (drop black pixels at the end of the last row)
+    --profile       print time, bytes and pixels spent per stage (read, decode, render, ...) to stderr
+    --cprofile  PARAMETER: file path to dump cProfile statistics to (readable with pstats)
+    --disk-cache        PARAMETER: directory to cache decoded images in across runs (memory-mapped when reused)
+    --disk-cache-size   PARAMETER: size limit of the disk cache in megabytes (default: 1024)
 """
         VIEWER_HELP = ("Help", """Usage:
     viewer.pyw [INPUTFILE] [OPTIONS [PARAMETERS]]
 Options:
     --lang      PARAMETER: language code (ISO 639-1), changes language of program
+    --profile   print time spent per stage (decode, render, ...) to stderr on exit
+    --cprofile  PARAMETER: file path to dump cProfile statistics to
+    --disk-cache        PARAMETER: directory to cache decoded images in across launches
+    --disk-cache-size   PARAMETER: size limit of the disk cache in megabytes (default: 1024)
     -?          show this message
 """)
+        BATCH_FILE_DONE = "done: {input_path} -> {output_path} ({seconds:.3f}s)"
+        BATCH_FILE_FAILED = "failed: {input_path} ({error})"
+        BATCH_SUMMARY = "{done} of {total} files transcoded in {seconds:.2f}s ({files_per_second:.1f} files/s, {mb_per_second:.2f} MB/s, {pixels_per_second:.0f} pixels/s)"
+        ENCODE_SIZE = "{size} bytes written ({ratio:.2f}x smaller pixel data than row by row encoding with {row_size} bytes)"
+        INFO_SUMMARY = "{input_path}: {width}x{height} pixels ({pixels} encoded, {padding} padding), {bytes} bytes, {runs} runs, compression ratio {ratio:.2f}"
+        INFO_HISTOGRAM = "    run lengths: {buckets}"
+        INFO_ANOMALIES = "    anomalies: {zero_pxcounts} pxcounts of 0, {consecutive_pxcounts} consecutive pxcounts, trailing pxcount: {trailing_pxcount}"
+        VERIFY_VALID = "valid: {input_path}"
+        VERIFY_INVALID = "invalid: {input_path}"
+        PACK_BUILT = "{images} images packed into {pack_path} ({bytes} bytes)"
+        PACK_MEMBER = "{name}  width={width}  {bytes} bytes  offset={offset}"
+        PACK_EXTRACTED = "done: {name} -> {output_path}"
 
     class Error:
         EXCEPTION_PREFIX = "Error message:"
@@ -96,7 +169,21 @@ Options:
         INVALID_MODE = "Please supply a valid mode of operation."
         INVALID_INPUT_PATH = "Please supply a valid input file path."
         INVALID_OUTPUT_PATH = "Please supply a valid output file path."
+        INVALID_ENGINE = "Please supply a valid decode engine (numpy, python)."
+        INVALID_WORKERS = "Please supply a positive integer amount of workers."
+        INVALID_ROWS = "Please supply a valid row range (START:STOP, e.g. 100:200)."
+        INVALID_IMAGE_SHAPE = "only 2D grayscale images can be encoded"
+        IMAGE_EMPTY = "the image needs to contain at least one pixel"
+        WIDTH_MISMATCH = "the width doesn't match the width of the file to append to"
+        INVALID_PACK = "supplied file is not a DerLungRLE pack file"
+        PACK_MEMBER_NOT_FOUND = "the pack file doesn't contain the requested image"
+        DUPLICATE_PACK_MEMBER = "images in a pack file need unique file names"
+        DUPLICATE_OUTPUT_PATH = "several images would be written to the same output file"
+        INVALID_CACHE_SIZE = "Please supply a positive integer disk cache size in megabytes."
         IMAGE_TOO_SMALL_TO_DISPLAY = ("Image too small", "Image width or height is too small to be displayed.")
+        NO_INPUT_FILES = "No input files found."
+        INVALID_EXPORT_FORMAT = "Please supply a valid export format (pgm, raw, npy, bin or an image format supported by Pillow)."
+        IMAGE_NOT_DECODED = ("Image not ready", "The image can be saved once it is completely decoded.")
 
 
 
@@ -124,19 +211,67 @@ class GermanDE(LanguagePack):
         TRANSCODE_HELP = """
 Nutzung:
     transcode.py MODUS INPUTFILE [OUTPUTFILE]
+    transcode.py BATCHMODUS INPUTFILES... [OPTIONEN]
+    transcode.py PAKETMODUS PACKFILE [INPUTFILES... | IMAGES...] [OPTIONEN]
 Modi:
-    -d  --decode    INPUTFILE decodieren und in stdout schreiben
+    -d  --decode    INPUTFILE decodieren und in stdout schreiben oder nach OUTPUTFILE exportieren
+                    (pgm, raw und npy werden beim Decodieren geschrieben, bin wird nach dem Decodieren neu codiert, andere Formate über Pillow)
     -e  --encode    OUTPUTFILE aus INPUTFILE codieren (standardmäßig out.bin im gleichen Verzeichnis wie INPUTFILE)
+    -bd --batch-decode  alle INPUTFILES (Pfade, Verzeichnisse oder Glob-Muster) decodieren und als Bilder exportieren
+    -be --batch-encode  alle INPUTFILES (Pfade, Verzeichnisse oder Glob-Muster) codieren
+    -i  --info      Größe, Auffüllung, Kompressionsrate, Lauflängen-Histogramm und Anomalien aller INPUTFILES ausgeben
+                    (ohne Decodierung gescannt)
+    -v  --verify    alle INPUTFILES auf Anomalien prüfen (pxcounts von 0, aufeinanderfolgende pxcounts, pxcount am Ende),
+                    bei Funden mit Statuscode 1 beenden
+    -pb --pack-build    alle INPUTFILES (Pfade, Verzeichnisse oder Glob-Muster) in PACKFILE packen
+    -pl --pack-list     die Bilder in PACKFILE auflisten
+    -px --pack-extract  IMAGES (standardmäßig alle) aus PACKFILE als DerLungRLE-Dateien extrahieren
+    -pd --pack-decode   IMAGES (standardmäßig alle) aus PACKFILE decodieren und als Bilder exportieren
     -?  --help      diese Nachricht anzeigen
 Options:
     --lang      PARAMETER: Sprachen-Code (ISO 639-1), ändert die Sprache des Programms
+    --engine    PARAMETER: Decodier-Engine ('numpy' (Standard) oder 'python' Referenzimplementierung)
+    --workers   PARAMETER: Anzahl an Worker-Prozessen, die eine Datei parallel decodieren (numpy-Engine, Standard: 1)
+                oder in Batch-Modi Dateien transcodieren (Standard: Anzahl der CPUs)
+    --out       PARAMETER: Output-Verzeichnis der Batch-Modi (Standard: Verzeichnis der jeweiligen INPUTFILE)
+                und der Paket-Extrahier-/Decodiermodi (Standard: Verzeichnis von PACKFILE)
+    --format    PARAMETER: Bildformat (Dateiendung) der im Batch- und Paket-Decodiermodus exportierten Dateien (Standard: png)
+                oder im Decodiermodus (Standard: Dateiendung von OUTPUTFILE, pgm für stdout)
+    -           als INPUTFILE oder OUTPUTFILE: aus stdin lesen oder in stdout schreiben
+    --rows      PARAMETER: Decodiermodus: nur die Zeilen START:STOP (ohne STOP) decodieren und dabei nur die nötigen
+                Pixeldaten über einen Zeilenindex lesen (neben INPUTFILE als INPUTFILE.idx gespeichert)
+    --fit           Decodiermodus: Bild verkleinern, damit es in das Terminal passt
+    --half-blocks   Decodiermodus: zwei Pixelreihen pro Zeile mit Halbblock-Zeichen ausgeben
+    --shading       Decodiermodus: Graustufen statt nur Schwarz/Weiß ausgeben
+    --optimize      Codiermodi: Dateigröße minimieren (schwarze Pixel am Ende der letzten Zeile weglassen)
+    --profile       Zeit, Bytes und Pixel pro Verarbeitungsschritt (Lesen, Decodieren, Rendern, ...) in stderr ausgeben
+    --cprofile  PARAMETER: Dateipfad, in den cProfile-Statistiken geschrieben werden (lesbar mit pstats)
+    --disk-cache        PARAMETER: Verzeichnis, in dem decodierte Bilder über Programmläufe hinweg zwischengespeichert werden
+                        (bei Wiederverwendung per Memory-Map geladen)
+    --disk-cache-size   PARAMETER: Größenlimit des Festplatten-Caches in Megabytes (Standard: 1024)
 """
         VIEWER_HELP = ("Hilfe", """Nutzung:
     viewer.pyw [INPUTFILE] [OPTIONEN [PARAMETER]]
 Optionen:
     --lang      PARAMETER: Sprachen-Code (ISO 639-1), ändert die Sprache des Programms
+    --profile   beim Beenden Zeit pro Verarbeitungsschritt (Decodieren, Rendern, ...) in stderr ausgeben
+    --cprofile  PARAMETER: Dateipfad, in den cProfile-Statistiken geschrieben werden
+    --disk-cache        PARAMETER: Verzeichnis, in dem decodierte Bilder über Programmstarts hinweg zwischengespeichert werden
+    --disk-cache-size   PARAMETER: Größenlimit des Festplatten-Caches in Megabytes (Standard: 1024)
     -?          diese Nachricht anzeigen
 """)
+        BATCH_FILE_DONE = "fertig: {input_path} -> {output_path} ({seconds:.3f}s)"
+        BATCH_FILE_FAILED = "fehlgeschlagen: {input_path} ({error})"
+        BATCH_SUMMARY = "{done} von {total} Dateien in {seconds:.2f}s transcodiert ({files_per_second:.1f} Dateien/s, {mb_per_second:.2f} MB/s, {pixels_per_second:.0f} Pixel/s)"
+        ENCODE_SIZE = "{size} Bytes geschrieben ({ratio:.2f}x kleinere Pixeldaten als zeilenweise Codierung mit {row_size} Bytes)"
+        INFO_SUMMARY = "{input_path}: {width}x{height} Pixel ({pixels} codiert, {padding} Auffüllung), {bytes} Bytes, {runs} Läufe, Kompressionsrate {ratio:.2f}"
+        INFO_HISTOGRAM = "    Lauflängen: {buckets}"
+        INFO_ANOMALIES = "    Anomalien: {zero_pxcounts} pxcounts von 0, {consecutive_pxcounts} aufeinanderfolgende pxcounts, pxcount am Ende: {trailing_pxcount}"
+        VERIFY_VALID = "gültig: {input_path}"
+        VERIFY_INVALID = "ungültig: {input_path}"
+        PACK_BUILT = "{images} Bilder in {pack_path} gepackt ({bytes} Bytes)"
+        PACK_MEMBER = "{name}  Breite={width}  {bytes} Bytes  Offset={offset}"
+        PACK_EXTRACTED = "fertig: {name} -> {output_path}"
 
     class Error:
         EXCEPTION_PREFIX = "Fehlermeldung:"
@@ -149,4 +284,27 @@ Optionen:
         INVALID_MODE = "Bitte geben Sie einen gültigen Modus an."
         INVALID_INPUT_PATH = "Bitte geben Sie einen gültigen Input-Dateipfad an."
         INVALID_OUTPUT_PATH = "Bitte geben Sie einen gültigen Output-Dateipfad an."
-        IMAGE_TOO_SMALL_TO_DISPLAY = ("Bild zu klein", "Bildbreite oder -höhe ist zu klein, um angezeigt zu werden.")
\ No newline at end of file
+        INVALID_ENGINE = "Bitte geben Sie eine gültige Decodier-Engine an (numpy, python)."
+        INVALID_WORKERS = "Bitte geben Sie eine positive ganze Zahl an Workern an."
+        INVALID_ROWS = "Bitte geben Sie einen gültigen Zeilenbereich an (START:STOP, z. B. 100:200)."
+        INVALID_IMAGE_SHAPE = "nur 2D-Graustufenbilder können codiert werden"
+        IMAGE_EMPTY = "das Bild muss mindestens einen Pixel enthalten"
+        WIDTH_MISMATCH = "die Breite stimmt nicht mit der Breite der Datei überein, an die angehängt werden soll"
+        INVALID_PACK = "angegebene Datei ist keine DerLungRLE-Paketdatei"
+        PACK_MEMBER_NOT_FOUND = "die Paketdatei enthält das angeforderte Bild nicht"
+        DUPLICATE_PACK_MEMBER = "Bilder in einer Paketdatei brauchen eindeutige Dateinamen"
+        DUPLICATE_OUTPUT_PATH = "mehrere Bilder würden in dieselbe Output-Datei geschrieben"
+        INVALID_CACHE_SIZE = "Bitte eine positive ganze Zahl als Größe des Festplatten-Caches in Megabytes angeben."
+        IMAGE_TOO_SMALL_TO_DISPLAY = ("Bild zu klein", "Bildbreite oder -höhe ist zu klein, um angezeigt zu werden.")
+        NO_INPUT_FILES = "Keine Input-Dateien gefunden."
+        INVALID_EXPORT_FORMAT = "Bitte geben Sie ein gültiges Exportformat an (pgm, raw, npy, bin oder ein von Pillow unterstütztes Bildformat)."
+        IMAGE_NOT_DECODED = ("Bild nicht bereit", "Das Bild kann gespeichert werden, sobald es vollständig decodiert ist.")
+
+
+
+
+
+
+
+# all available language packs by language code
+LANGUAGES: dict[str, type[LanguagePack]] = {language.LANGUAGE_CODE: language for language in (EnglishUS, GermanDE)}
@@ -14,6 +14,7 @@ class DerLungRLE:
 
 
     HEADER_SIZE = 2 # bytes
+    MAX_PXCOUNT = 0b0111_1111
 
 
     def encode_width(self, width: int) -> bytes:
@@ -38,7 +39,7 @@ class DerLungRLE:
 
         Raise AssertionError if value is too large to be converted to pxcount byte
         """
-        assert count <= 0b0111_1111, self.LANG.Error.TOO_LARGE_FOR_PXCOUNT
+        assert count <= self.MAX_PXCOUNT, self.LANG.Error.TOO_LARGE_FOR_PXCOUNT
         return 0b1000_0000 + count
 
 
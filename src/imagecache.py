@@ -0,0 +1,253 @@
+"""
+Size-bounded caches for decoded DerLungRLE images, shared by DerLungRLE utilities:
+in memory (per process) and on disk (shared by all processes using the same directory).
+"""
+
+from collections import OrderedDict
+from os import path, stat, scandir, makedirs, remove, replace, utime, chmod
+from typing import Hashable
+import hashlib
+import logging
+import tempfile
+import threading
+import time
+import numpy as np
+
+
+
+
+TEMP_SUFFIX = ".tmp"
+TEMP_MAX_AGE = 60 * 60 # seconds after which a temporary file is considered left over by a crashed writer
+ENTRY_MODE = 0o644 # permissions of cached images, readable by processes of other users sharing the directory
+
+
+
+
+class ImageCache:
+    """
+    least recently used cache of decoded images (2D uint8 arrays)
+    with an eviction budget in bytes instead of entries
+    """
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes: int = max_bytes
+        self.size: int = 0 # bytes currently cached
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self._entries: OrderedDict[Hashable, np.ndarray] = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+
+    def get(self, key: Hashable) -> np.ndarray | None:
+        """Return cached image for given key (and mark it as recently used) or None if it isn't cached"""
+        with self._lock:
+            pixels: np.ndarray | None = self._entries.get(key)
+            if pixels is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return pixels
+
+
+    def put(self, key: Hashable, pixels: np.ndarray) -> None:
+        """
+        caches given image under given key as read-only array,
+        evicting least recently used images until it fits into the budget;
+        images larger than the whole budget are not cached
+        """
+        if pixels.nbytes > self.max_bytes:
+            logging.debug(f"not caching image of {pixels.nbytes}B (budget: {self.max_bytes}B)")
+            return
+        pixels.setflags(write=False)
+
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key).nbytes
+            while self.size + pixels.nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted.nbytes
+                self.evictions += 1
+            self._entries[key] = pixels
+            self.size += pixels.nbytes
+
+
+    def clear(self) -> None:
+        """removes all cached images (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+    def stats(self) -> dict[str, int]:
+        """Return hit/miss/eviction counters and current usage"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes
+            }
+
+
+
+class DiskCache:
+    """
+    least recently used cache of decoded images stored as .npy files in a directory, with an eviction budget in bytes;
+    cached images are memory-mapped instead of read, and files are written atomically (temporary file, then rename),
+    so any amount of processes can share the directory
+    """
+    def __init__(self, directory, max_bytes: int) -> None:
+        makedirs(directory, exist_ok=True)
+        self.directory: str = path.abspath(directory)
+        self.max_bytes: int = max_bytes
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self._lock: threading.Lock = threading.Lock()
+
+
+    def entry_path(self, key: Hashable) -> str:
+        """Return path of the file caching the image of given key"""
+        return path.join(self.directory, hashlib.blake2b(repr(key).encode("utf-8"), digest_size=16).hexdigest() + ".npy")
+
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+
+    def get(self, key: Hashable) -> np.ndarray | None:
+        """Return read-only memory map of cached image for given key (and mark it as recently used) or None if it isn't cached"""
+        entry_path: str = self.entry_path(key)
+        try:
+            pixels: np.ndarray = np.load(entry_path, mmap_mode="r")
+        except FileNotFoundError: # not cached (or evicted by another process in the meantime)
+            self._count("misses")
+            return None
+        except (OSError, ValueError) as ex:
+            logging.warning(f"dropping unreadable disk cache entry {entry_path}: {ex!r}")
+            self._count("misses")
+            try:
+                remove(entry_path)
+            except OSError:
+                pass
+            return None
+        try:
+            utime(entry_path) # modification time is the last use
+        except OSError: # entry of another user (or evicted in the meantime), still readable
+            pass
+        self._count("hits")
+        return pixels
+
+
+    def put(self, key: Hashable, pixels: np.ndarray) -> None:
+        """
+        caches given image under given key, evicting least recently used images until the cache fits into the budget;
+        images whose file (.npy header included) is larger than the whole budget are not cached
+        """
+        if pixels.nbytes > self.max_bytes:
+            logging.debug(f"not caching image of {pixels.nbytes}B on disk (budget: {self.max_bytes}B)")
+            return
+
+        entry_path: str = self.entry_path(key)
+        temp_path: str | None = None # removed unless it was renamed to the entry
+        try:
+            with tempfile.NamedTemporaryFile(dir=self.directory, suffix=TEMP_SUFFIX, delete=False) as file:
+                temp_path = file.name
+                np.save(file, pixels)
+                entry_size: int = file.tell()
+            if entry_size > self.max_bytes:
+                logging.debug(f"not caching image file of {entry_size}B on disk (budget: {self.max_bytes}B)")
+                return
+            chmod(temp_path, ENTRY_MODE) # temporary files are only accessible by their owner
+            replace(temp_path, entry_path) # atomic, readers see either no file or a complete one
+            temp_path = None
+        except OSError as ex: # e.g. disk full or entry memory-mapped by another process (Windows), the image just isn't cached
+            logging.debug(f"not caching image on disk: {ex!r}")
+            return
+        finally:
+            if temp_path is not None:
+                self._remove(temp_path)
+        logging.debug(f"cached image file of {entry_size}B on disk as {entry_path}")
+        self.evict(keep=entry_path)
+
+
+    def _remove(self, file_path: str) -> bool:
+        """
+        removes file at given path; failures (e.g. files memory-mapped by another process on Windows) are only logged
+
+        Return if the file is gone
+        """
+        try:
+            remove(file_path)
+        except FileNotFoundError: # removed by another process
+            pass
+        except OSError as ex:
+            logging.debug(f"can't remove disk cache file {file_path}: {ex!r}")
+            return False
+        return True
+
+
+    def entries(self) -> list[tuple[int, int, str]]:
+        """Return modification time, size and path of every cached image; removes left over temporary files"""
+        entries: list[tuple[int, int, str]] = []
+        for entry in scandir(self.directory):
+            try:
+                entry_stat = entry.stat()
+                if entry.name.endswith(".npy"):
+                    entries.append((entry_stat.st_mtime_ns, entry_stat.st_size, entry.path))
+                elif entry.name.endswith(TEMP_SUFFIX) and time.time() - entry_stat.st_mtime > TEMP_MAX_AGE:
+                    self._remove(entry.path)
+            except FileNotFoundError: # removed by another process
+                continue
+        return entries
+
+
+    def evict(self, keep: str | None = None) -> None:
+        """removes least recently used images (except the file at given path) until the cache fits into the budget"""
+        entries: list[tuple[int, int, str]] = self.entries()
+        size: int = sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, entry_path in sorted(entries):
+            if size <= self.max_bytes:
+                break
+            if entry_path == keep:
+                continue
+            if self._remove(entry_path): # processes that have it mapped keep their mapping (except on Windows)
+                size -= entry_size
+                self._count("evictions")
+
+
+    def clear(self) -> None:
+        """removes all cached images (counters are kept)"""
+        for _, _, entry_path in self.entries():
+            self._remove(entry_path)
+
+
+    def stats(self) -> dict[str, int]:
+        """Return hit/miss/eviction counters of this process and current usage of the directory"""
+        entries: list[tuple[int, int, str]] = self.entries()
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(entries),
+                "bytes": sum(entry_size for _, entry_size, _ in entries),
+                "max_bytes": self.max_bytes
+            }
+
+
+
+def file_key(image_path) -> tuple[str, int, int]:
+    """Return cheap cache key for file at given path: real path, modification time and size"""
+    file_stat = stat(image_path)
+    return path.realpath(image_path), file_stat.st_mtime_ns, file_stat.st_size
+
+
+
+def data_key(image_width: int, pixel_data) -> tuple[int, bytes]:
+    """Return cache key for in-memory pixel data (any object supporting the buffer protocol): width and fast digest"""
+    return image_width, hashlib.blake2b(pixel_data, digest_size=16).digest()
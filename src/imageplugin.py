@@ -0,0 +1,137 @@
+"""
+Pillow image plugin for DerLungRLE images: importing this module registers the format with Pillow,
+so Image.open() and Image.save() work with DerLungRLE files (.rle).
+
+The format has no magic number, so Image.open() only recognizes files by their extension
+(streams without a file name are left to other formats); use open_stream() to open any other stream.
+"""
+
+import transcode
+from os import path, fsdecode
+from contextvars import ContextVar
+import logging
+from typing import Iterator
+from PIL import Image, ImageFile
+
+
+
+
+FORMAT = "DERLUNGRLE"
+FORMAT_DESCRIPTION = "DerLungRLE run-length encoded grayscale"
+EXTENSIONS = (".rle",)
+EXPLICIT: ContextVar[bool] = ContextVar("EXPLICIT", default=False) # set while open_stream() opens a stream
+
+
+
+
+def read_chunks(file) -> Iterator[bytes]:
+    """Return iterator over chunks of the rest of given open file, leaving the file open (it belongs to Pillow)"""
+    return iter(lambda: file.read(transcode.CHUNK_SIZE), b"")
+
+
+
+class DerLungRLEImageFile(ImageFile.ImageFile):
+    """
+    DerLungRLE image opened by Pillow; opening reads the header and counts the pixels
+    (without decoding them) to get the image height, the pixels are decoded by load()
+    """
+    format = FORMAT
+    format_description = FORMAT_DESCRIPTION
+
+
+    def _open(self) -> None:
+        if not EXPLICIT.get():
+            file_name: str | bytes = self.filename or getattr(self.fp, "name", "")
+            if not isinstance(file_name, (str, bytes)) or path.splitext(fsdecode(file_name))[1].lower() not in EXTENSIONS:
+                raise SyntaxError("not a DerLungRLE file")
+
+        header: bytes = self.fp.read(transcode.STANDARD.HEADER_SIZE)
+        if len(header) < transcode.STANDARD.HEADER_SIZE or int.from_bytes(header, "big") == 0:
+            raise SyntaxError("not a DerLungRLE file")
+        image_width: int = int.from_bytes(header, "big")
+
+        pixel_count: int = transcode.count_pixels(read_chunks(self.fp))
+        self.fp.seek(transcode.STANDARD.HEADER_SIZE)
+        logging.debug(f"opened DerLungRLE image with width={image_width}, {pixel_count} pixels")
+
+        self._mode = "L"
+        self._size = (image_width, max(1, -(-pixel_count // image_width)))
+        self.tile = [(FORMAT, (0, 0) + self.size, transcode.STANDARD.HEADER_SIZE, (image_width, 1))]
+
+
+    def draft(self, mode: str | None, size: tuple[int, int] | None) -> tuple[str, tuple[int, int, float, float]] | None:
+        """
+        configures load() to only decode every n-th row and column (n being the largest integer factor
+        that keeps the image at least as large as given size); used by thumbnail()
+
+        Return mode and box of the original image in coordinates of the reduced one, or None if already configured
+        """
+        if len(self.tile) != 1 or self.tile[0][3][1] != 1 or not size:
+            return None
+        image_width, original_size = self.tile[0][3][0], self.size
+        scale: int = max(1, min(self.size[0] // max(1, size[0]), self.size[1] // max(1, size[1])))
+        self._size = (-(-original_size[0] // scale), -(-original_size[1] // scale))
+        self.tile = [(FORMAT, (0, 0) + self.size, transcode.STANDARD.HEADER_SIZE, (image_width, scale))]
+        logging.debug(f"draft: decoding every {scale}. row and column")
+        return self.mode, (0, 0, original_size[0] / scale, original_size[1] / scale)
+
+
+
+class DerLungRLEDecoder(ImageFile.PyDecoder):
+    """
+    decodes DerLungRLE pixel data (args: image width, scale) block by block straight into Pillow's image buffer;
+    reduced images (scale > 1) only sample every scale-th row and column (see transcode.decode_scaled())
+    """
+    _pulls_fd = True
+
+
+    def decode(self, buffer: bytes) -> tuple[int, int]:
+        image_width, scale = self.args
+        if scale > 1:
+            self.set_as_raw(transcode.decode_scaled(image_width, read_chunks(self.fd), scale).tobytes())
+            return -1, 0 # finished
+
+        height: int = self.state.ysize
+        first_row: int = 0 # of the current block
+        for rows in transcode.decode_stream(image_width, read_chunks(self.fd)):
+            rows = rows[:height - first_row]
+            if len(rows) == 0:
+                break
+            self.state.yoff, self.state.ysize = first_row, len(rows)
+            self.set_as_raw(rows.tobytes())
+            first_row += len(rows)
+        return -1, 0 # finished
+
+
+
+def _save(image: Image.Image, file, filename: str | bytes) -> None:
+    """
+    save handler; encodes an image of any mode (converted to luminance values) with transcode.encode()
+    and supports its optimize option
+    """
+    file.write(transcode.encode(image, bool(image.encoderinfo.get("optimize", False))))
+
+
+
+def open_stream(file) -> Image.Image:
+    """
+    opens DerLungRLE image from given binary stream regardless of its name (or lack thereof),
+    which Image.open() doesn't recognize as DerLungRLE
+
+    Raise PIL.UnidentifiedImageError if the stream doesn't start with a valid header
+    """
+    token = EXPLICIT.set(True)
+    try:
+        return Image.open(file, formats=[FORMAT])
+    finally:
+        EXPLICIT.reset(token)
+
+
+
+
+
+
+Image.register_open(FORMAT, DerLungRLEImageFile)
+Image.register_decoder(FORMAT, DerLungRLEDecoder)
+Image.register_save(FORMAT, _save)
+Image.register_extensions(FORMAT, list(EXTENSIONS))
@@ -0,0 +1,176 @@
+"""
+Pack files: many DerLungRLE images concatenated behind an index, so that any image can be read
+by name or position from a single memory map instead of opening one file per image.
+
+Layout (all integers big-endian):
+    header      magic (4 bytes), version (2 bytes), amount of images (4 bytes)
+    index       per image: offset (8 bytes), length (8 bytes), width (2 bytes),
+                length of name (2 bytes), name (UTF-8)
+    data        pixel data of every image (without the width header), at the offsets given in the index
+"""
+
+from definitions.standard import DerLungRLE
+import definitions.lang as lang
+from os import path
+from typing import Iterator
+import logging
+import mmap
+import shutil
+import struct
+
+
+
+
+MAGIC = b"DLRP"
+VERSION = 1
+HEADER = struct.Struct(">4sHI") # magic, version, amount of images
+ENTRY = struct.Struct(">QQHH") # offset, length, width, length of name
+EXTENSION = ".dlrp"
+
+
+
+
+class Pack:
+    """
+    read-only pack file; the whole file is memory-mapped once and the pixel data of its images
+    are exposed as memoryviews into the map without copying them (they need to be released before close())
+    """
+    def __init__(self, pack_path, msg_lang: lang.LanguagePack) -> None:
+        """
+        opens pack file at given path and reads its index
+
+        Raise AssertionError if the file is not a pack file of a supported version or its index is truncated or corrupt
+        """
+        logging.debug(f"opening pack {pack_path}")
+        self.LANG: lang.LanguagePack = msg_lang
+        with open(pack_path, "rb") as file:
+            assert path.getsize(pack_path) >= HEADER.size, self.LANG.Error.INVALID_PACK
+            self.data: mmap.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.names: list[str] = []
+        self.offsets: list[int] = []
+        self.lengths: list[int] = []
+        self.widths: list[int] = []
+        try:
+            magic, version, count = HEADER.unpack_from(self.data, 0)
+            assert magic == MAGIC and version == VERSION, self.LANG.Error.INVALID_PACK
+            self._read_index(count)
+        except AssertionError:
+            self.close()
+            raise
+        self.positions: dict[str, int] = {name: index for index, name in enumerate(self.names)}
+        logging.debug(f"read index of {count} images")
+
+
+    def _read_index(self, count: int) -> None:
+        """
+        reads given amount of index entries following the header
+
+        Raise AssertionError if an entry or the pixel data it points to lies outside of the file
+        """
+        position: int = HEADER.size
+        for _ in range(count):
+            assert position + ENTRY.size <= len(self.data), self.LANG.Error.INVALID_PACK
+            offset, length, width, name_length = ENTRY.unpack_from(self.data, position)
+            position += ENTRY.size
+            assert position + name_length <= len(self.data), self.LANG.Error.INVALID_PACK
+            self.names.append(str(self.data[position:position + name_length], "utf-8", errors="replace"))
+            position += name_length
+            self.offsets.append(offset)
+            self.lengths.append(length)
+            self.widths.append(width)
+        # pixel data is stored behind the whole index
+        for offset, length, width in zip(self.offsets, self.lengths, self.widths):
+            assert position <= offset and offset + length <= len(self.data) and width > 0, self.LANG.Error.INVALID_PACK
+
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+    def position(self, member: str | int) -> int:
+        """
+        Return position in the index of image with given name (or position)
+
+        Raise AssertionError if there is no such image
+        """
+        if isinstance(member, int):
+            assert -len(self.names) <= member < len(self.names), self.LANG.Error.PACK_MEMBER_NOT_FOUND
+            return member % len(self.names)
+        assert member in self.positions, self.LANG.Error.PACK_MEMBER_NOT_FOUND
+        return self.positions[member]
+
+
+    def image_data(self, member: str | int) -> dict[str, int | memoryview]:
+        """
+        gets image data of image with given name (or position) without reading any other image
+
+        Return image data as dict containing (like transcode.get_image_data())
+          "width": image width
+          "pxdata": pixel data
+
+        Raise AssertionError if there is no such image
+        """
+        position: int = self.position(member)
+        offset: int = self.offsets[position]
+        return {"width": self.widths[position], "pxdata": memoryview(self.data)[offset:offset + self.lengths[position]]}
+
+
+    def __iter__(self) -> Iterator[tuple[str, dict[str, int | memoryview]]]:
+        """Return iterator over name and image data of every image in the order of the index"""
+        return ((name, self.image_data(position)) for position, name in enumerate(self.names))
+
+
+    def close(self) -> None:
+        """unmaps the pack file"""
+        self.data.close()
+
+
+    def __enter__(self) -> "Pack":
+        return self
+
+
+    def __exit__(self, *exception) -> None:
+        self.close()
+
+
+
+def build_pack(pack_path, image_paths: list[str], msg_lang: lang.LanguagePack) -> list[tuple[str, int, int, int]]:
+    """
+    writes pack file of DerLungRLE files at given paths (named after their file names) to given path,
+    copying their pixel data without decoding them; the pack file itself is skipped if it's among the paths
+
+    Return index of written pack: name, offset, length and width of every image
+
+    Raise AssertionError if a file is too short, its width is 0 or two files have the same name
+    """
+    # an existing pack (e.g. from an earlier run on the same directory) is truncated before it would be read
+    image_paths = [image_path for image_path in image_paths if path.realpath(image_path) != path.realpath(pack_path)]
+    logging.info(f"packing {len(image_paths)} images into {pack_path}")
+
+    standard: DerLungRLE = DerLungRLE(msg_lang)
+    names: list[bytes] = [path.basename(image_path).encode("utf-8") for image_path in image_paths]
+    assert len(set(names)) == len(names), msg_lang.Error.DUPLICATE_PACK_MEMBER
+    widths: list[int] = []
+    for image_path in image_paths:
+        assert path.getsize(image_path) >= standard.HEADER_SIZE + 1, msg_lang.Error.FILE_TOO_SHORT
+        with open(image_path, "rb") as file:
+            widths.append(int.from_bytes(file.read(standard.HEADER_SIZE), "big"))
+        assert widths[-1] > 0, msg_lang.Error.WIDTH_ZERO
+
+    index: list[tuple[str, int, int, int]] = []
+    offset: int = HEADER.size + sum(ENTRY.size + len(name) for name in names)
+    for image_path, name, width in zip(image_paths, names, widths):
+        length: int = path.getsize(image_path) - standard.HEADER_SIZE
+        index.append((name.decode("utf-8"), offset, length, width))
+        offset += length
+
+    with open(pack_path, "wb") as pack_file:
+        pack_file.write(HEADER.pack(MAGIC, VERSION, len(index)))
+        for (_, offset, length, width), name in zip(index, names):
+            pack_file.write(ENTRY.pack(offset, length, width, len(name)) + name)
+        for image_path in image_paths:
+            with open(image_path, "rb") as file:
+                file.seek(standard.HEADER_SIZE)
+                shutil.copyfileobj(file, pack_file)
+    return index
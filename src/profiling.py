@@ -0,0 +1,94 @@
+"""
+Lightweight per-stage timing instrumentation for DerLungRLE utilities.
+"""
+
+from contextlib import contextmanager
+from typing import Callable, Any, Iterator, TextIO
+from sys import stderr
+import logging
+import threading
+import time
+
+
+
+
+PROFILE_ARGV_OPTION = "--profile"
+CPROFILE_ARGV_OPTION = "--cprofile"
+
+
+
+
+class Profiler:
+    """
+    accumulates wall time, bytes processed and pixel counts per named stage;
+    recording is a no-op until enabled
+    """
+    def __init__(self) -> None:
+        self.enabled: bool = False
+        self.stages: dict[str, dict[str, float]] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+
+    @contextmanager
+    def stage(self, name: str, byte_count: int = 0, pixels: int = 0) -> Iterator[dict[str, int]]:
+        """
+        times the enclosed block as given stage; bytes and pixels can also be set
+        on the yielded dict ("bytes", "pixels") inside the block if they are only known afterwards
+        """
+        record: dict[str, int] = {"bytes": byte_count, "pixels": pixels}
+        if not self.enabled:
+            yield record
+            return
+
+        start: float = time.perf_counter()
+        try:
+            yield record
+        finally:
+            self.add(name, time.perf_counter() - start, record["bytes"], record["pixels"])
+
+
+    def add(self, name: str, seconds: float, byte_count: int = 0, pixels: int = 0) -> None:
+        """adds a measurement to given stage"""
+        with self._lock:
+            stage: dict[str, float] = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0, "bytes": 0, "pixels": 0})
+            stage["calls"] += 1
+            stage["seconds"] += seconds
+            stage["bytes"] += byte_count
+            stage["pixels"] += pixels
+
+
+    def summary(self) -> list[dict[str, Any]]:
+        """Return one dict per stage (in order of first use) with calls, seconds, bytes, pixels and throughputs"""
+        with self._lock:
+            return [{
+                "stage": name,
+                **stage,
+                "mb_per_s": stage["bytes"] / stage["seconds"] / 1e6 if stage["seconds"] > 0 else 0.0,
+                "mpx_per_s": stage["pixels"] / stage["seconds"] / 1e6 if stage["seconds"] > 0 else 0.0
+            } for name, stage in self.stages.items()]
+
+
+    def print_summary(self, file: TextIO = stderr) -> None:
+        """prints summary table of all stages to given file"""
+        print(f"{'stage':<18}{'calls':>8}{'seconds':>12}{'bytes':>14}{'pixels':>14}{'MB/s':>10}{'Mpx/s':>10}", file=file)
+        for stage in self.summary():
+            print(f"{stage['stage']:<18}{stage['calls']:>8}{stage['seconds']:>12.4f}{stage['bytes']:>14}"
+                  f"{stage['pixels']:>14}{stage['mb_per_s']:>10.1f}{stage['mpx_per_s']:>10.1f}", file=file)
+        logging.info(f"profile: {self.summary()}")
+
+
+
+def run_cprofiled(function: Callable, stats_path: str, *args) -> Any:
+    """calls function with given arguments under cProfile and dumps the stats to given path (readable with pstats)"""
+    import cProfile
+
+    logging.info(f"dumping cProfile stats to {stats_path}")
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(function, *args)
+    finally:
+        profile.dump_stats(stats_path)
+
+
+
+PROFILER = Profiler()
@@ -0,0 +1,202 @@
+"""
+Run-based in-memory representation of DerLungRLE images: an image is kept as parallel arrays of
+run lengths and luminance values instead of one value per pixel, and operations work on the runs
+so that mostly flat images never need to be expanded.
+"""
+
+import transcode
+import logging
+import numpy as np
+
+
+
+
+WHITE = 0b1111_1111 # luminance of white pixels produced by RLEImage.threshold()
+BLACK = 0b0000_0000 # luminance of black pixels produced by RLEImage.threshold()
+
+
+
+
+def merge_runs(lengths: np.ndarray, colors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Return given runs without runs of 0 pixels, neighbouring runs of the same color merged into one"""
+    kept: np.ndarray = lengths > 0
+    lengths, colors = lengths[kept], colors[kept]
+    if len(lengths) == 0:
+        return lengths, colors
+    starts: np.ndarray = np.concatenate(([0], np.flatnonzero(colors[1:] != colors[:-1]) + 1))
+    return np.add.reduceat(lengths, starts), colors[starts]
+
+
+
+class RLEImage:
+    """
+    grayscale image stored as runs that span rows: lengths (pixels, >0) and colors (uint8 luminance values)
+    of all runs in row-major order, covering exactly width * height pixels (padding included)
+    """
+    __slots__ = ("width", "height", "lengths", "colors")
+
+
+    def __init__(self, width: int, lengths: np.ndarray, colors: np.ndarray) -> None:
+        self.lengths, self.colors = merge_runs(np.asarray(lengths, dtype=np.int64), np.asarray(colors, dtype=np.uint8))
+        self.width: int = width
+        self.height: int = int(self.lengths.sum()) // width
+
+
+    @classmethod
+    def from_pixel_data(cls, image_width: int, pixel_data) -> "RLEImage":
+        """
+        reads runs of pixel data encoded following the standard defined at https://github.com/DevLung/DerLungRLE)
+        without expanding them; the last row is padded with black like decode() does
+        """
+        logging.debug(f"reading runs of {len(pixel_data)} bytes of pixel data with width={image_width}")
+
+        data: np.ndarray = np.frombuffer(pixel_data, dtype=np.uint8)
+        color_positions, counts = transcode.scan_runs(data)
+        pixel_count: int = int(counts.sum())
+        padding: int = max(1, -(-pixel_count // image_width)) * image_width - pixel_count
+        return cls(image_width, np.append(counts, padding),
+                   np.append(transcode.COLOR_LUT[data[color_positions]], transcode.COLOR_LUT[0b0000_0000]))
+
+
+    @classmethod
+    def from_file(cls, image_path) -> "RLEImage":
+        """
+        reads runs of DerLungRLE file at given path without expanding them
+
+        Raise AssertionError if file is too short or if width is 0
+        """
+        with transcode.open_image_data(image_path) as image_data:
+            return cls.from_pixel_data(*image_data.values())
+
+
+    @classmethod
+    def from_array(cls, pixels: np.ndarray) -> "RLEImage":
+        """Return runs of given 2D array of uint8 luminance values"""
+        colors, lengths = transcode.find_runs(np.ascontiguousarray(pixels, dtype=np.uint8).ravel())
+        return cls(pixels.shape[1], lengths, colors)
+
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        """(height, width) like the shape of the expanded array"""
+        return self.height, self.width
+
+
+    @property
+    def nbytes(self) -> int:
+        """bytes taken by the run arrays"""
+        return self.lengths.nbytes + self.colors.nbytes
+
+
+    def __repr__(self) -> str:
+        return f"RLEImage(width={self.width}, height={self.height}, runs={len(self.lengths)})"
+
+
+    def run_ends(self) -> np.ndarray:
+        """Return index of the pixel after each run (in the flattened image)"""
+        return np.cumsum(self.lengths)
+
+
+    def clip(self, starts: np.ndarray, stops: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        clips runs to given ranges [start, stop) of pixels of the flattened image, touching only the runs they overlap
+
+        starts, stops
+          non-empty pixel ranges within the image
+
+        Return index of each overlapping run, amount of its pixels inside the range and index of the range,
+        ordered by range and then by run
+        """
+        starts, stops = np.asarray(starts, dtype=np.int64), np.asarray(stops, dtype=np.int64)
+        ends: np.ndarray = self.run_ends()
+        first: np.ndarray = np.searchsorted(ends, starts, side="right")
+        last: np.ndarray = np.searchsorted(ends, stops - 1, side="right")
+        amounts: np.ndarray = last - first + 1
+
+        ranges: np.ndarray = np.repeat(np.arange(len(starts)), amounts)
+        offsets: np.ndarray = np.arange(amounts.sum()) - np.repeat(np.cumsum(amounts) - amounts, amounts)
+        runs: np.ndarray = first[ranges] + offsets
+        clipped: np.ndarray = (np.minimum(ends[runs], stops[ranges])
+                               - np.maximum(ends[runs] - self.lengths[runs], starts[ranges]))
+        return runs, clipped, ranges
+
+
+    def row_runs(self, row: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Return lengths and colors of the runs of given row
+
+        Raise IndexError if row is out of range
+        """
+        if not 0 <= row < self.height:
+            raise IndexError(f"row {row} out of range for image of height {self.height}")
+        runs, clipped, _ = self.clip([row * self.width], [(row + 1) * self.width])
+        return clipped, self.colors[runs]
+
+
+    def row(self, row: int) -> np.ndarray[tuple[int], np.dtype[np.uint8]]:
+        """
+        Return pixel luminance values of given row (only this row is expanded)
+
+        Raise IndexError if row is out of range
+        """
+        lengths, colors = self.row_runs(row)
+        return np.repeat(colors, lengths)
+
+
+    def crop(self, left: int, top: int, right: int, bottom: int) -> "RLEImage":
+        """
+        Return box [left, right) x [top, bottom) of the image (clamped to its size)
+
+        Raise ValueError if the box is empty
+        """
+        left, right = max(left, 0), min(right, self.width)
+        top, bottom = max(top, 0), min(bottom, self.height)
+        if left >= right or top >= bottom:
+            raise ValueError(f"empty crop box ({left}, {top}, {right}, {bottom})")
+
+        row_starts: np.ndarray = np.arange(top, bottom, dtype=np.int64) * self.width
+        runs, clipped, _ = self.clip(row_starts + left, row_starts + right)
+        return RLEImage(right - left, clipped, self.colors[runs])
+
+
+    def threshold(self, level: int = 0b1000_0000) -> "RLEImage":
+        """Return image with pixels of at least given luminance turned white and all others black"""
+        return RLEImage(self.width, self.lengths, np.where(self.colors >= level, WHITE, BLACK))
+
+
+    def invert(self) -> "RLEImage":
+        """Return image with inverted luminance values"""
+        return RLEImage(self.width, self.lengths, 0b1111_1111 - self.colors)
+
+
+    def histogram(self) -> np.ndarray[tuple[int], np.dtype[np.int64]]:
+        """Return amount of pixels of each luminance value (index)"""
+        return np.bincount(self.colors, weights=self.lengths, minlength=0b1_0000_0000).astype(np.int64)
+
+
+    def downscale(self, factor: int) -> "RLEImage":
+        """
+        Return image downscaled by given integer factor, averaging each factor x factor box
+        like transcode.downscale(); every row of every box (height * width / factor ranges) is clipped
+        against the runs it overlaps, so the image is never expanded, but the cost still grows with
+        the image size (about factor times less than per pixel) and not only with the amount of runs
+        """
+        if factor <= 1:
+            return self
+        # pixel ranges of every row of every box
+        box_columns: np.ndarray = np.arange(0, self.width, factor, dtype=np.int64)
+        box_widths: np.ndarray = np.diff(box_columns, append=self.width)
+        row_starts: np.ndarray = np.arange(self.height, dtype=np.int64) * self.width
+        starts: np.ndarray = (row_starts[:, np.newaxis] + box_columns).ravel()
+        runs, clipped, ranges = self.clip(starts, starts + np.tile(box_widths, self.height))
+
+        sums: np.ndarray = np.bincount(ranges, weights=clipped * self.colors[runs], minlength=len(starts))
+        box_rows: np.ndarray = np.arange(0, self.height, factor)
+        box_heights: np.ndarray = np.diff(box_rows, append=self.height)
+        boxes: np.ndarray = np.add.reduceat(sums.reshape(self.height, len(box_columns)), box_rows, axis=0)
+        return RLEImage.from_array((boxes.astype(np.int64) // np.outer(box_heights, box_widths)).astype(np.uint8))
+
+
+    def to_array(self) -> np.ndarray[tuple[int, int], np.dtype[np.uint8]]:
+        """Return expanded 2D array of pixel luminance values with shape (height, width)"""
+        return np.repeat(self.colors, self.lengths).reshape(self.height, self.width)
@@ -0,0 +1,202 @@
+"""
+Row offset index for random access to row ranges of DerLungRLE images.
+"""
+
+import transcode
+from os import path, stat, remove, replace, chmod
+import logging
+import tempfile
+import zipfile
+import numpy as np
+
+
+
+
+INDEX_INTERVAL = 256 # rows between checkpoints
+SIDECAR_SUFFIX = ".idx"
+SIDECAR_MODE = 0o644 # permissions of sidecar files (temporary files are only accessible by their owner)
+
+
+
+
+class RowIndex:
+    """
+    checkpoints of DerLungRLE pixel data: for every interval-th row the byte offset of the run
+    (pxcount byte if there is one, color byte otherwise) its first pixel belongs to
+    and how many pixels of that run belong to earlier rows
+    """
+    def __init__(self, image_width: int, interval: int, pixel_count: int,
+                 offsets: np.ndarray, skips: np.ndarray, source: tuple[int, int] = (0, 0)) -> None:
+        self.width: int = image_width
+        self.interval: int = interval
+        self.pixel_count: int = pixel_count # decoded pixels without padding
+        self.offsets: np.ndarray = offsets
+        self.skips: np.ndarray = skips
+        self.source: tuple[int, int] = source # modification time and size of indexed file
+
+
+    @property
+    def height(self) -> int:
+        """image height in rows (including a padded last row)"""
+        return max(1, -(-self.pixel_count // self.width))
+
+
+    def save(self, index_path) -> None:
+        """
+        writes index to given (sidecar) file path atomically (temporary file, then rename),
+        so readers never see a partially written index
+        """
+        logging.debug(f"saving row index with {len(self.offsets)} checkpoints to {index_path}")
+        with tempfile.NamedTemporaryFile(dir=path.dirname(path.abspath(index_path)), suffix=".tmp", delete=False) as file:
+            try:
+                np.savez(file, width=self.width, interval=self.interval, pixel_count=self.pixel_count,
+                         offsets=self.offsets, skips=self.skips, source=np.array(self.source, dtype=np.int64))
+            except BaseException:
+                file.close()
+                remove(file.name)
+                raise
+        try:
+            chmod(file.name, SIDECAR_MODE)
+            replace(file.name, index_path)
+        except BaseException:
+            remove(file.name)
+            raise
+
+
+    @classmethod
+    def load(cls, index_path) -> "RowIndex":
+        """reads index from given (sidecar) file path"""
+        logging.debug(f"loading row index from {index_path}")
+        with np.load(index_path) as index:
+            return cls(int(index["width"]), int(index["interval"]), int(index["pixel_count"]),
+                       index["offsets"], index["skips"], tuple(int(value) for value in index["source"]))
+
+
+
+def build_index(image_width: int, pixel_data, interval: int = INDEX_INTERVAL) -> RowIndex:
+    """
+    builds row index of pixel data encoded following the standard defined at https://github.com/DevLung/DerLungRLE)
+    in a single vectorized pass
+
+    image_width
+      width of image in pixels
+    pixel_data
+      DerLungRLE-encoded pixel data (any object supporting the buffer protocol)
+    interval=INDEX_INTERVAL
+      amount of rows between checkpoints
+    """
+    logging.debug(f"building row index of {len(pixel_data)} bytes of pixel data with width={image_width}, interval={interval}")
+
+    data: np.ndarray = np.frombuffer(pixel_data, dtype=np.uint8)
+    color_positions, counts = transcode.scan_runs(data)
+    run_ends: np.ndarray = np.cumsum(counts)
+    run_offsets: np.ndarray = color_positions.copy()
+    prefixed: np.ndarray = color_positions > 0
+    prefixed[prefixed] = data[color_positions[prefixed] - 1] & 0b1000_0000 != 0
+    run_offsets[prefixed] -= 1
+
+    pixel_count: int = int(run_ends[-1]) if len(run_ends) > 0 else 0
+    index: RowIndex = RowIndex(image_width, interval, pixel_count, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+
+    # first run that ends after each checkpoint's first pixel (runs of 0 pixels are never picked)
+    checkpoint_pixels: np.ndarray = np.arange(0, index.height, interval, dtype=np.int64) * image_width
+    runs: np.ndarray = np.searchsorted(run_ends, checkpoint_pixels, side="right")
+    in_data: np.ndarray = runs < len(run_ends)
+    index.offsets = np.full(len(runs), len(data), dtype=np.int64) # checkpoints in padding point at the end
+    index.offsets[in_data] = run_offsets[runs[in_data]]
+    index.skips = np.zeros(len(runs), dtype=np.int64)
+    index.skips[in_data] = checkpoint_pixels[in_data] - (run_ends - counts)[runs[in_data]]
+    return index
+
+
+
+def index_path(image_path) -> str:
+    """Return path of the sidecar index file of the image file at given path"""
+    return image_path + SIDECAR_SUFFIX
+
+
+
+def get_index(image_path, interval: int = INDEX_INTERVAL, sidecar: bool = True) -> RowIndex:
+    """
+    gets row index of image file at given path,
+    from its sidecar file if it's up to date or by building it otherwise
+
+    sidecar=True
+      read and write sidecar file next to the image file
+
+    Raise AssertionError if file is too short or if width is 0
+    """
+    file_stat = stat(image_path)
+    source: tuple[int, int] = (file_stat.st_mtime_ns, file_stat.st_size)
+
+    if sidecar and path.exists(index_path(image_path)):
+        try:
+            index: RowIndex = RowIndex.load(index_path(image_path))
+            if index.source == source and index.interval == interval:
+                return index
+            logging.debug("sidecar index is outdated")
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile) as ex:
+            logging.warning(f"rebuilding unreadable sidecar index {index_path(image_path)}: {ex!r}")
+
+    with transcode.open_image_data(image_path) as image_data:
+        index = build_index(*image_data.values(), interval=interval)
+    index.source = source
+    if sidecar:
+        try:
+            index.save(index_path(image_path))
+        except OSError as ex: # the sidecar is only a cache
+            logging.warning(f"not saving sidecar index {index_path(image_path)}: {ex!r}")
+    return index
+
+
+
+def decode_rows(pixel_data, index: RowIndex, start: int, stop: int) -> np.ndarray[tuple[int, int], np.dtype[np.uint8]]:
+    """
+    decodes rows [start, stop) of pixel data encoded following the standard defined at https://github.com/DevLung/DerLungRLE),
+    starting at the nearest checkpoint of given index instead of at the beginning of the pixel data
+
+    pixel_data
+      DerLungRLE-encoded pixel data (any object supporting the buffer protocol) the index was built for
+    index
+      row index of pixel data
+    start, stop
+      row range to decode, clamped to the image height
+
+    Return array of pixel luminance values with shape (stop - start, width)
+    """
+    start = min(max(start, 0), index.height)
+    stop = min(max(stop, start), index.height)
+    logging.debug(f"decoding rows {start} to {stop} of {index.height}")
+
+    rows: np.ndarray = np.full((stop - start) * index.width, transcode.COLOR_LUT[0b0000_0000], dtype=np.uint8)
+    if len(rows) == 0:
+        return rows.reshape(0, index.width)
+
+    checkpoint: int = start // index.interval
+    skip: int = int(index.skips[checkpoint]) + (start - checkpoint * index.interval) * index.width
+    filled: int = 0
+
+    chunks = transcode.split_chunks(memoryview(pixel_data)[int(index.offsets[checkpoint]):])
+    for pixels in transcode.expand_stream(chunks):
+        if skip >= len(pixels):
+            skip -= len(pixels)
+            continue
+        pixels = pixels[skip:skip + len(rows) - filled]
+        skip = 0
+        rows[filled:filled + len(pixels)] = pixels
+        filled += len(pixels)
+        if filled == len(rows):
+            break
+    return rows.reshape(stop - start, index.width)
+
+
+
+def read_rows(image_path, start: int, stop: int, sidecar: bool = True) -> np.ndarray[tuple[int, int], np.dtype[np.uint8]]:
+    """
+    gets rows [start, stop) of image file at given path, touching only the pixel data they need
+
+    Raise AssertionError if file is too short or if width is 0
+    """
+    index: RowIndex = get_index(image_path, sidecar=sidecar)
+    with transcode.open_image_data(image_path) as image_data:
+        return decode_rows(image_data["pxdata"], index, start, stop)
@@ -0,0 +1,174 @@
+"""
+Appendable streaming writer of DerLungRLE files for producers that deliver an image row by row:
+memory stays bounded by the write buffer no matter how many rows are written.
+
+Usage:
+    with StreamWriter("out.bin", width) as writer:
+        for rows in producer():
+            writer.write_rows(rows)     # 2D array of uint8 luminance values (or a single row)
+
+    with StreamWriter("out.bin", append=True) as writer:   # continue an existing file
+        writer.write_rows(more_rows)
+"""
+
+import transcode
+from os import path
+from typing import Any, BinaryIO
+import logging
+import numpy as np
+
+
+
+
+WRITE_BUFFER_SIZE = 64 * 1024 # bytes of encoded pixel data collected before they are written to the file
+
+
+
+
+class StreamWriter:
+    """
+    encodes rows into a DerLungRLE file as they are written; the last run is kept open
+    so that runs continuing across calls (and rows) are merged instead of split
+    """
+    def __init__(self, file_path, width: int | None = None, append: bool = False,
+                 buffer_size: int = WRITE_BUFFER_SIZE) -> None:
+        """
+        opens file at given path for writing; appending continues an existing file (a new file is created if there is none)
+
+        width=None
+          image width in pixels; needed for new files, checked against the header of existing files
+        append=False
+          continue the existing file instead of overwriting it
+        buffer_size=WRITE_BUFFER_SIZE
+          bytes of encoded pixel data collected before they are written
+
+        Raise AssertionError if the width is missing, 0, too large or doesn't match the existing file
+        """
+        self.buffer_size: int = buffer_size
+        self.buffer: bytearray = bytearray()
+        self.run_color: int | None = None # color byte of the open run (None if there is none)
+        self.run_length: int = 0 # pixels of the open run
+        self.pixels: int = 0 # pixels written (including the open run)
+        self.overwrite: bool = False # recovered tail of an appended file still on disk, overwritten by the next flush
+
+        if append and path.exists(file_path):
+            self.file: BinaryIO = open(file_path, "r+b")
+            try:
+                self._recover(width)
+            except BaseException:
+                self.file.close()
+                raise
+        else:
+            assert width is not None and width > 0, transcode.LANG.Error.WIDTH_ZERO
+            logging.debug(f"writing new DerLungRLE file {file_path} with width={width}")
+            self.file = open(file_path, "wb")
+            self.file.write(transcode.STANDARD.encode_width(width))
+            self.width: int = width
+
+
+    def _recover(self, width: int | None) -> None:
+        """
+        reads width and pixel count of the opened existing file and reopens its trailing run
+        (it stays on disk until the first flush overwrites it); an incomplete last row is padded with black
+
+        Raise AssertionError if the file is too short, its width is 0 or doesn't match given width
+        """
+        end: int = 0 # end of the pixel data before the open run, which is rewritten
+        if path.getsize(self.file.name) > transcode.STANDARD.HEADER_SIZE:
+            with transcode.open_image_data(self.file.name) as image_data:
+                image_width, pixel_data = image_data.values()
+                scan: dict[str, Any] = transcode.scan_structure(image_width, pixel_data)
+                end = len(pixel_data)
+                while end > 0 and transcode.STANDARD.is_pxcount(pixel_data[end - 1]): # trailing pxcounts are dropped
+                    end -= 1
+                if end > 0:
+                    prefixed: bool = end > 1 and transcode.STANDARD.is_pxcount(pixel_data[end - 2])
+                    self.run_color = pixel_data[end - 1]
+                    self.run_length = transcode.STANDARD.from_pxcount(pixel_data[end - 2]) if prefixed else 1
+                    end -= 2 if prefixed else 1
+                    if self.run_length == 0: # dropped by decoders anyway
+                        self.run_color = None
+        else: # only a header (nothing written yet)
+            header: bytes = self.file.read(transcode.STANDARD.HEADER_SIZE)
+            assert len(header) == transcode.STANDARD.HEADER_SIZE, transcode.LANG.Error.FILE_TOO_SHORT
+            image_width = int.from_bytes(header, "big")
+            assert image_width > 0, transcode.LANG.Error.WIDTH_ZERO
+            scan = transcode.scan_structure(image_width, b"")
+        assert width is None or width == image_width, transcode.LANG.Error.WIDTH_MISMATCH
+        self.width = image_width
+        self.pixels = scan["pixels"]
+        logging.debug(f"appending to {self.file.name}: {self.pixels} pixels, open run of {self.run_length}x{self.run_color}")
+
+        self.file.seek(transcode.STANDARD.HEADER_SIZE + end)
+        self.overwrite = True
+        if self.pixels % self.width != 0:
+            self._add_runs(np.array([0b0000_0000], dtype=np.uint8), np.array([self.width - self.pixels % self.width]))
+
+
+    @property
+    def rows(self) -> int:
+        """amount of complete rows written"""
+        return self.pixels // self.width
+
+
+    def _add_runs(self, colors: np.ndarray, lengths: np.ndarray) -> None:
+        """appends given runs (of color bytes), merging the first one into the open run and keeping the last one open"""
+        if len(colors) == 0:
+            return
+        self.pixels += int(lengths.sum())
+        lengths = lengths.astype(np.int64)
+        if self.run_color is not None:
+            if int(colors[0]) == self.run_color:
+                lengths[0] += self.run_length
+            else:
+                colors = np.concatenate(([self.run_color], colors)).astype(np.uint8)
+                lengths = np.concatenate(([self.run_length], lengths))
+
+        self.run_color, self.run_length = int(colors[-1]), int(lengths[-1])
+        self.buffer += transcode.encode_runs(colors[:-1], lengths[:-1]).tobytes()
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+
+    def write_rows(self, rows: np.ndarray) -> None:
+        """
+        encodes given rows (2D array of uint8 luminance values or a single row)
+
+        Raise AssertionError if the rows are not as wide as the image
+        """
+        rows = np.atleast_2d(np.asarray(rows))
+        assert rows.ndim == 2 and rows.shape[1] == self.width, transcode.LANG.Error.INVALID_IMAGE_SHAPE
+        if rows.dtype != np.uint8:
+            rows = np.clip(rows, 0, 0b1111_1111).astype(np.uint8)
+        with transcode.PROFILER.stage("encode", pixels=rows.size):
+            self._add_runs(*transcode.find_runs(transcode.QUANTIZE_LUT[rows.ravel()]))
+
+
+    def flush(self) -> None:
+        """writes buffered pixel data to the file (the open run is only written once the writer is closed)"""
+        with transcode.PROFILER.stage("write", byte_count=len(self.buffer)):
+            self.file.write(self.buffer)
+            if self.overwrite: # cut off what's left of the recovered tail
+                self.file.truncate()
+                self.overwrite = False
+        self.buffer.clear()
+
+
+    def close(self) -> None:
+        """writes the open run and buffered pixel data and closes the file"""
+        if self.file.closed:
+            return
+        if self.run_color is not None:
+            self.buffer += transcode.encode_runs(np.array([self.run_color]), np.array([self.run_length])).tobytes()
+            self.run_color, self.run_length = None, 0
+        self.flush()
+        self.file.close()
+        logging.debug(f"closed DerLungRLE file with {self.rows} rows")
+
+
+    def __enter__(self) -> "StreamWriter":
+        return self
+
+
+    def __exit__(self, *exception) -> None:
+        self.close()
@@ -1,12 +1,24 @@
 import definitions.standard as standard
 import definitions.lang as lang
-from sys import argv, stderr, exit
-from os import path
-from typing import Callable, Any
+import imagecache
+import profiling
+from profiling import PROFILER
+from sys import argv, stdin, stdout, stderr, exit
+from os import path, listdir, cpu_count
+from typing import Callable, Any, Iterable, Iterator, BinaryIO, TYPE_CHECKING
+from contextlib import contextmanager
 import logging
+import io
 import struct
-import inspect
-from functools import lru_cache
+import mmap
+import glob
+import time
+import numpy as np
+# Pillow, shutil and multiprocessing are only imported by the code paths that need them (to keep startup fast)
+if TYPE_CHECKING:
+    from PIL import Image
+    from concurrent.futures import Executor, ProcessPoolExecutor
+    from multiprocessing import shared_memory
 
 
 
@@ -16,59 +28,158 @@ INPUT_PATH_ARGV = 2
 OUTPUT_PATH_ARGV = 3
 DEBUG_ARGV_OPTION = "--debug"
 LANG_ARGV_OPTION = "--lang"
+ENGINE_ARGV_OPTION = "--engine"
+ENGINES = ("numpy", "python")
+WORKERS_ARGV_OPTION = "--workers"
+PARALLEL_MIN_SIZE = 1024 * 1024 # bytes of pixel data below which decoding in parallel isn't worth the overhead
+OUT_DIR_ARGV_OPTION = "--out"
+FORMAT_ARGV_OPTION = "--format"
+DEFAULT_EXPORT_FORMAT = "png"
+ENCODED_EXTENSION = ".bin"
+DEFAULT_OUTPUT_NAME = "out.bin"
+CHUNK_SIZE = 64 * 1024 # bytes of pixel data read at once when streaming
+ROWS_PER_BLOCK = 64 # rows yielded at once when streaming
+CACHE_SIZE = 256 * 1024 * 1024 # bytes of decoded images kept in IMAGE_CACHE
+DISK_CACHE_ARGV_OPTION = "--disk-cache"
+DISK_CACHE_SIZE_ARGV_OPTION = "--disk-cache-size"
+DISK_CACHE_SIZE = 1024 # megabytes of decoded images kept in DISK_CACHE by default
 BLACK_PIXEL = "□"
 WHITE_PIXEL = "■"
+HALF_BLOCKS = (" ", "▄", "▀", "█") # indexed by 2 * (top pixel is white) + (bottom pixel is white)
+SHADES = " ░▒▓█" # from black to white
+GRAYSCALE_COLORS = range(232, 256) # grayscale ramp of 256-color terminals, from black to white
+FIT_ARGV_OPTION = "--fit"
+HALF_BLOCKS_ARGV_OPTION = "--half-blocks"
+SHADING_ARGV_OPTION = "--shading"
+OPTIMIZE_ARGV_OPTION = "--optimize"
+ROWS_ARGV_OPTION = "--rows"
+STDIO_PATH = "-" # file path standing for stdin (input) or stdout (output)
+STREAM_EXPORT_FORMATS = ("pgm", "raw", "npy") # export formats written row block by row block while decoding
+DEFAULT_STDOUT_FORMAT = "pgm" # export format when decoding to stdout without --format
 LOG_PATH: str = path.realpath(path.join(path.dirname(__file__), "debug.log"))
-logging.basicConfig(
-    level=logging.INFO,
-    format="[%(asctime)s] [%(levelname)s] [%(filename)s: %(lineno)d, in %(funcName)s]:  %(message)s",
-    datefmt="%d-%m-%Y %H:%M:%S",
-    encoding="utf-8",
-    filename=LOG_PATH,
-    filemode="w"
-)
-if DEBUG_ARGV_OPTION in argv:
-    logging.getLogger().setLevel(logging.DEBUG)
-LANG: lang.LanguagePack = lang.EnglishUS()
-# if there is enough argvs to fit lang option AND if option flag is supplied AND if there is another argv behind it
-if len(argv) > 2 and LANG_ARGV_OPTION in argv and argv.index(LANG_ARGV_OPTION) < len(argv) - 1:
-    for _, language in inspect.getmembers(lang, inspect.isclass):
-        if not language == lang.LanguagePack and language.LANGUAGE_CODE == argv[argv.index(LANG_ARGV_OPTION) + 1].lower():
-            LANG = language
+LANG: lang.LanguagePack = lang.EnglishUS() # set by main() from argv
 STANDARD = standard.DerLungRLE(LANG)
+IMAGE_CACHE = imagecache.ImageCache(CACHE_SIZE)
+ENGINE: str = ENGINES[0] # set by main() from argv
+WORKERS: int = 1 # set by main() from argv
+DISK_CACHE: imagecache.DiskCache | None = None # set by main() from argv, disabled if None
+PARALLEL_POOL: "tuple[int, ProcessPoolExecutor] | None" = None # (workers, pool) of decode_parallel(), see get_parallel_pool()
 
 
 
 
 
 
-def get_image_data(image_path) -> dict[str, int | bytes]:
+def get_image_data(image_path, mapped: bool = True) -> dict[str, int | bytes | memoryview]:
     """
     gets image data from a file and splits it into image width information and pixel data
     following the standard defined at https://github.com/DevLung/DerLungRLE)
 
+    image_path
+      file path or STDIO_PATH to read all image data from stdin
+    mapped=True
+      memory-map the file and expose its pixel data as a read-only memoryview without copying it,
+      instead of reading the whole file into memory; the map is only released once the memoryview
+      (and everything created from it) is garbage collected, which keeps the file open (and locked on Windows)
+      until then, use open_image_data() to release it when done
+
     Return image data as dict containing
       "width": image width
       "data": pixel data
 
     Raise AssertionError if file is too short or if width is 0
     """
-    logging.debug(f"getting image data from {image_path}")
+    logging.debug(f"getting image data from {image_path} ({'memory-mapped' if mapped else 'read'})")
 
-    with open(image_path, "rb") as file:
-        data: bytes = file.read()
+    with PROFILER.stage("read") as record, open(stdin.fileno() if image_path == STDIO_PATH else image_path, "rb",
+                                                 closefd=image_path != STDIO_PATH) as file:
+        if image_path == STDIO_PATH:
+            data: bytes | mmap.mmap = file.read()
+            mapped = False
+        elif mapped:
+            assert path.getsize(image_path) >= STANDARD.HEADER_SIZE + 1, LANG.Error.FILE_TOO_SHORT
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            data = file.read()
+        record["bytes"] = len(data)
     assert len(data) >= STANDARD.HEADER_SIZE + 1, LANG.Error.FILE_TOO_SHORT
 
-    image_data: dict[str, int | bytes] = {
-        "width": struct.unpack(">H", data[:STANDARD.HEADER_SIZE])[0],
-        "pxdata": data[STANDARD.HEADER_SIZE:]
+    image_data: dict[str, int | bytes | memoryview] = {
+        "width": struct.unpack_from(">H", data, 0)[0],
+        "pxdata": memoryview(data)[STANDARD.HEADER_SIZE:] if mapped else data[STANDARD.HEADER_SIZE:]
     }
     assert image_data["width"] > 0, LANG.Error.WIDTH_ZERO
-    logging.debug(f"read {len(data)} bytes of image data (pixel data: {len(image_data['pxdata'])}B, width={image_data['width']})")
+    logging.debug(f"got {len(data)} bytes of image data (pixel data: {len(image_data['pxdata'])}B, width={image_data['width']})")
     return image_data
 
 
 
+@contextmanager
+def open_image_data(image_path, mapped: bool = True) -> Iterator[dict[str, int | bytes | memoryview]]:
+    """
+    gets image data like get_image_data() for the duration of a with block and unmaps the file when leaving it;
+    the pixel data must not be used afterwards (if arrays created from it are still alive,
+    the map is left to garbage collection instead)
+
+    Raise AssertionError if file is too short or if width is 0
+    """
+    image_data: dict[str, int | bytes | memoryview] = get_image_data(image_path, mapped)
+    try:
+        yield image_data
+    finally:
+        pixel_data: bytes | memoryview = image_data.pop("pxdata")
+        if isinstance(pixel_data, memoryview):
+            try:
+                data: mmap.mmap = pixel_data.obj
+                pixel_data.release()
+                data.close()
+            except BufferError:
+                logging.debug(f"pixel data of {image_path} still in use, not unmapping it")
+
+
+
+def split_chunks(pixel_data, chunk_size: int = CHUNK_SIZE) -> Iterator[memoryview]:
+    """splits given pixel data (any object supporting the buffer protocol) into chunks of given size without copying"""
+    view: memoryview = memoryview(pixel_data)
+    for start in range(0, len(view), chunk_size):
+        yield view[start:start + chunk_size]
+
+
+
+def read_chunks(file: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """reads given file in chunks of given size until its end and closes it afterwards"""
+    with file:
+        while True:
+            with PROFILER.stage("read") as record:
+                chunk: bytes = file.read(chunk_size)
+                record["bytes"] = len(chunk)
+            if not chunk:
+                return
+            yield chunk
+
+
+
+def stream_image_data(image_path, chunk_size: int = CHUNK_SIZE) -> tuple[int, Iterator[bytes]]:
+    """
+    gets image width from a file and prepares reading its pixel data in chunks
+    following the standard defined at https://github.com/DevLung/DerLungRLE)
+
+    Return image width and an iterator over chunks of pixel data of at most chunk_size bytes
+
+    Raise AssertionError if file is too short or if width is 0
+    """
+    logging.debug(f"streaming image data from {image_path} in chunks of {chunk_size}B")
+
+    assert path.getsize(image_path) >= STANDARD.HEADER_SIZE + 1, LANG.Error.FILE_TOO_SHORT
+    file: BinaryIO = open(image_path, "rb")
+    image_width: int = struct.unpack(">H", file.read(STANDARD.HEADER_SIZE))[0]
+    if image_width == 0:
+        file.close()
+    assert image_width > 0, LANG.Error.WIDTH_ZERO
+    return image_width, read_chunks(file, chunk_size)
+
+
+
 def color(color_byte: int) -> int:
     """decodes color byte into uint8 luminance value (grayscale)"""
 
@@ -76,17 +187,23 @@ def color(color_byte: int) -> int:
     return luminance_uint8
 
 
+# luminance values of all 7-bit color bytes, index with color byte to decode
+COLOR_LUT: np.ndarray[tuple[int], np.dtype[np.uint8]] = np.array([color(byte) for byte in range(0b1000_0000)], dtype=np.uint8)
+# nearest color byte of all uint8 luminance values, index with luminance to encode; inverse of COLOR_LUT
+QUANTIZE_LUT: np.ndarray[tuple[int], np.dtype[np.uint8]] = np.round(np.arange(0b1_0000_0000) / 0b1111_1111 * 0b0111_1111).astype(np.uint8)
+
+
 
-@lru_cache(maxsize=64)
-def decode(image_width: int, pixel_data: bytes) -> list[list[int]]:
+def decode(image_width: int, pixel_data: bytes | memoryview) -> list[list[int]]:
     """
     decodes pixel data encoded following the standard defined at https://github.com/DevLung/DerLungRLE)
-    into a 2D list of pixel luminance values that can easily be iterated over or converted to NumPy array
+    into a 2D list of pixel luminance values that can easily be iterated over or converted to NumPy array;
+    pure Python reference implementation of decode_array()
 
     image_width
       width of image in pixels
     pixel_data
-      DerLungRLE-encoded bytes of pixel data
+      DerLungRLE-encoded bytes of pixel data (bytes or read-only memoryview)
 
     Return list of pixel luminance values
     """
@@ -119,17 +236,727 @@ def decode(image_width: int, pixel_data: bytes) -> list[list[int]]:
 
 
 
-def pixels_to_stdout(pixels: list[list[int]]) -> None:
-    """prints a given list of pixel luminances to terminal (black/white only)"""
+def scan_runs(pixel_data) -> tuple[np.ndarray, np.ndarray]:
+    """
+    classifies all bytes of given pixel data at once
+
+    pixel_data
+      DerLungRLE-encoded pixel data (any object supporting the buffer protocol)
+
+    Return positions of all color bytes and the amount of pixels each of them stands for
+    """
+    data: np.ndarray = np.frombuffer(pixel_data, dtype=np.uint8)
+    is_pxcount: np.ndarray = data & 0b1000_0000 != 0
+    color_positions: np.ndarray = np.flatnonzero(~is_pxcount)
+
+    # a color byte is repeated as often as defined by the pxcount byte directly before it (if there is one)
+    counts: np.ndarray = np.ones(len(color_positions), dtype=np.int64)
+    prefixed: np.ndarray = color_positions > 0
+    prefixed[prefixed] = is_pxcount[color_positions[prefixed] - 1]
+    counts[prefixed] = data[color_positions[prefixed] - 1] & 0b0111_1111
+    return color_positions, counts
+
+
+
+def pad_to_rows(pixels: np.ndarray, image_width: int) -> np.ndarray[tuple[int, int], np.dtype[np.uint8]]:
+    """
+    reshapes flat array of pixel luminance values into rows of given width,
+    extending the last row with black pixels if needed to create a complete pixel grid
+    """
+    height: int = max(1, -(-len(pixels) // image_width)) # ceil division, at least one row
+    if len(pixels) == height * image_width:
+        return pixels.reshape(height, image_width)
+
+    grid: np.ndarray = np.full(height * image_width, COLOR_LUT[0b0000_0000], dtype=np.uint8)
+    grid[:len(pixels)] = pixels
+    return grid.reshape(height, image_width)
+
+
+
+def decode_array(image_width: int, pixel_data) -> np.ndarray[tuple[int, int], np.dtype[np.uint8]]:
+    """
+    decodes pixel data encoded following the standard defined at https://github.com/DevLung/DerLungRLE)
+    into a 2D NumPy array of pixel luminance values, processing all bytes at once
+
+    image_width
+      width of image in pixels
+    pixel_data
+      DerLungRLE-encoded pixel data (any object supporting the buffer protocol)
+
+    Return array of pixel luminance values with shape (height, width)
+    """
+    logging.debug(f"decoding {len(pixel_data)} bytes of pixel data with width={image_width} (numpy)")
+
+    data: np.ndarray = np.frombuffer(pixel_data, dtype=np.uint8)
+    color_positions, counts = scan_runs(data)
+    pixels: np.ndarray = np.repeat(COLOR_LUT[data[color_positions]], counts)
+    return pad_to_rows(pixels, image_width)
+
+
+
+def scan_stream(chunks: Iterable) -> Iterator[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    classifies all bytes of consecutive chunks of pixel data chunk by chunk (see scan_runs());
+    a pxcount byte at the end of a chunk is carried over to the next chunk
+
+    chunks
+      consecutive chunks of DerLungRLE-encoded pixel data (any objects supporting the buffer protocol)
+
+    Return iterator over each chunk's bytes, positions of its color bytes and the amount of pixels each of them stands for
+    """
+    pending_pxcount: int | None = None # pxcount byte at the end of the previous chunk
+
+    for chunk in chunks:
+        data: np.ndarray = np.frombuffer(chunk, dtype=np.uint8)
+        if len(data) == 0:
+            continue
+
+        with PROFILER.stage("scan", byte_count=len(data)):
+            color_positions, counts = scan_runs(data)
+            if pending_pxcount is not None and len(color_positions) > 0 and color_positions[0] == 0:
+                counts[0] = pending_pxcount
+            if STANDARD.is_pxcount(int(data[-1])):
+                pending_pxcount = STANDARD.from_pxcount(int(data[-1]))
+            else:
+                pending_pxcount = None
+
+        yield data, color_positions, counts
+
+
+
+def expand_stream(chunks: Iterable) -> Iterator[np.ndarray[tuple[int], np.dtype[np.uint8]]]:
+    """
+    decodes chunks of pixel data encoded following the standard defined at https://github.com/DevLung/DerLungRLE)
+    into flat arrays of pixel luminance values, one per chunk
+
+    chunks
+      consecutive chunks of DerLungRLE-encoded pixel data (any objects supporting the buffer protocol)
+
+    Return iterator over flat arrays of pixel luminance values
+    """
+    for data, color_positions, counts in scan_stream(chunks):
+        with PROFILER.stage("decode") as record:
+            pixels: np.ndarray = np.repeat(COLOR_LUT[data[color_positions]], counts)
+            record["pixels"] = len(pixels)
+        yield pixels
+
+
+
+def count_pixels(chunks: Iterable) -> int:
+    """Return amount of pixels (without padding) defined by consecutive chunks of pixel data, without decoding them"""
+    return sum(int(counts.sum()) for _, _, counts in scan_stream(chunks))
+
+
+
+def scan_structure(image_width: int, pixel_data, chunk_size: int = CHUNK_SIZE) -> dict[str, Any]:
+    """
+    scans the structure of pixel data encoded following the standard defined at https://github.com/DevLung/DerLungRLE)
+    without decoding it, classifying chunks of bytes with a few vectorized passes each
+
+    image_width
+      width of image in pixels
+    pixel_data
+      DerLungRLE-encoded pixel data (any object supporting the buffer protocol)
+
+    Return scan result as dict containing
+      "width", "height": image size in pixels
+      "pixels": amount of pixels defined by the pixel data
+      "padding": amount of black pixels the last row is extended with
+      "bytes": size of the file (header and pixel data)
+      "ratio": decoded size (one byte per pixel) / encoded size
+      "runs": amount of runs (color bytes)
+      "histogram": amount of runs of each length (index) from 0 to MAX_PXCOUNT
+      "zero_pxcounts": amount of pxcount bytes of 0 (runs of 0 pixels are dropped by decode())
+      "consecutive_pxcounts": amount of pxcount bytes followed by another pxcount byte (they are ignored by decode())
+      "trailing_pxcount": if the pixel data ends with a pxcount byte (it is ignored by decode())
+      "valid": if none of these anomalies was found
+    """
+    histogram: np.ndarray = np.zeros(STANDARD.MAX_PXCOUNT + 1, dtype=np.int64)
+    zero_pxcounts: int = 0
+    consecutive_pxcounts: int = 0
+    previous: np.ndarray = np.empty(0, dtype=np.uint8) # last byte of the previous chunk
+    for chunk in split_chunks(pixel_data, chunk_size):
+        data: np.ndarray = np.concatenate((previous, np.frombuffer(chunk, dtype=np.uint8)))
+        is_pxcount: np.ndarray = data >= 0b1000_0000
+        # pxcount bytes directly followed by their color byte
+        prefixes: np.ndarray = is_pxcount[:-1] & ~is_pxcount[1:]
+        histogram += np.bincount(data[:-1][prefixes] & 0b0111_1111, minlength=STANDARD.MAX_PXCOUNT + 1)
+        histogram[1] += np.count_nonzero(~is_pxcount[len(previous):]) - np.count_nonzero(prefixes)
+        zero_pxcounts += np.count_nonzero(data[len(previous):] == 0b1000_0000)
+        consecutive_pxcounts += np.count_nonzero(is_pxcount[:-1] & is_pxcount[1:])
+        previous = data[-1:]
+
+    pixel_count: int = int(histogram @ np.arange(len(histogram)))
+    height: int = max(1, -(-pixel_count // image_width))
+    trailing_pxcount: bool = len(previous) > 0 and STANDARD.is_pxcount(int(previous[0]))
+    return {
+        "width": image_width,
+        "height": height,
+        "pixels": pixel_count,
+        "padding": height * image_width - pixel_count,
+        "bytes": STANDARD.HEADER_SIZE + len(pixel_data),
+        "ratio": height * image_width / (STANDARD.HEADER_SIZE + len(pixel_data)),
+        "runs": int(histogram.sum()),
+        "histogram": histogram,
+        "zero_pxcounts": zero_pxcounts,
+        "consecutive_pxcounts": consecutive_pxcounts,
+        "trailing_pxcount": trailing_pxcount,
+        "valid": zero_pxcounts == 0 and consecutive_pxcounts == 0 and not trailing_pxcount
+    }
+
+
+
+def decode_stream(image_width: int, chunks: Iterable, rows_per_block: int = ROWS_PER_BLOCK) -> Iterator[np.ndarray[tuple[int, int], np.dtype[np.uint8]]]:
+    """
+    decodes chunks of pixel data encoded following the standard defined at https://github.com/DevLung/DerLungRLE)
+    into blocks of complete rows as soon as they are finished, keeping memory usage bounded;
+    runs continuing past a row, block or chunk boundary are carried over
+
+    image_width
+      width of image in pixels
+    chunks
+      consecutive chunks of DerLungRLE-encoded pixel data (any objects supporting the buffer protocol)
+    rows_per_block=ROWS_PER_BLOCK
+      amount of rows per yielded block; the last block may be shorter
+      and has its last row extended with black pixels if needed
+
+    Return iterator over arrays of pixel luminance values with shape (rows, width)
+    """
+    logging.debug(f"stream decoding pixel data with width={image_width} in blocks of {rows_per_block} rows")
+
+    block_size: int = rows_per_block * image_width
+    carry: np.ndarray = np.empty(0, dtype=np.uint8) # decoded pixels not yet yielded
+    yielded_any: bool = False
+
+    for pixels in expand_stream(chunks):
+        carry = np.concatenate((carry, pixels))
+        full_blocks: int = len(carry) // block_size
+        for block in range(full_blocks):
+            yield carry[block * block_size:(block + 1) * block_size].reshape(rows_per_block, image_width)
+            yielded_any = True
+        carry = carry[full_blocks * block_size:]
+
+    if len(carry) > 0 or not yielded_any:
+        yield pad_to_rows(carry, image_width)
+
+
+
+def decode_scaled(image_width: int, chunks: Iterable, factor: int) -> np.ndarray[tuple[int, int], np.dtype[np.uint8]]:
+    """
+    decodes only every factor-th row and column (starting with the first) of chunks of pixel data
+    encoded following the standard defined at https://github.com/DevLung/DerLungRLE);
+    sampled pixels are looked up in the run ends of each chunk, so runs are never expanded
+    and the work per chunk depends on its bytes and the sampled pixels only
+
+    image_width
+      width of image in pixels
+    chunks
+      consecutive chunks of DerLungRLE-encoded pixel data (any objects supporting the buffer protocol)
+    factor
+      integer downscale factor (>0)
+
+    Return array of sampled pixel luminance values with shape (ceil(height / factor), ceil(width / factor))
+    """
+    logging.debug(f"decoding every {factor}. row and column of pixel data with width={image_width}")
+
+    columns: np.ndarray = np.arange(0, image_width, factor, dtype=np.int64)
+    samples: list[np.ndarray] = []
+    offset: int = 0 # pixels defined by previous chunks
+    for data, color_positions, counts in scan_stream(chunks):
+        run_ends: np.ndarray = offset + np.cumsum(counts)
+        end: int = int(run_ends[-1]) if len(run_ends) > 0 else offset
+        with PROFILER.stage("decode") as record:
+            # sampled rows overlapping the pixels of this chunk
+            rows: np.ndarray = np.arange(-(-(offset // image_width) // factor) * factor, -(-end // image_width), factor, dtype=np.int64)
+            positions: np.ndarray = (rows[:, np.newaxis] * image_width + columns).ravel()
+            positions = positions[(positions >= offset) & (positions < end)]
+            runs: np.ndarray = np.searchsorted(run_ends, positions, side="right")
+            samples.append(COLOR_LUT[data[color_positions[runs]]])
+            record["pixels"] = len(positions)
+        offset = end
+
+    height: int = -(-max(1, -(-offset // image_width)) // factor)
+    scaled: np.ndarray = np.full(height * len(columns), COLOR_LUT[0b0000_0000], dtype=np.uint8)
+    sampled: np.ndarray = np.concatenate(samples) if samples else scaled[:0]
+    scaled[:len(sampled)] = sampled
+    return scaled.reshape(height, len(columns))
+
+
+
+def decode_to_size(image_width: int, pixel_data, max_width: int, max_height: int) -> np.ndarray[tuple[int, int], np.dtype[np.uint8]]:
+    """
+    decodes pixel data encoded following the standard defined at https://github.com/DevLung/DerLungRLE)
+    downscaled by the smallest integer factor that fits the image into given size (see decode_scaled())
+
+    image_width
+      width of image in pixels
+    pixel_data
+      DerLungRLE-encoded pixel data (any object supporting the buffer protocol)
+    max_width, max_height
+      size in pixels the downscaled image needs to fit into
+
+    Return array of sampled pixel luminance values
+    """
+    image_height: int = scan_structure(image_width, pixel_data)["height"]
+    factor: int = max(1, -(-image_width // max(1, max_width)), -(-image_height // max(1, max_height)))
+    return decode_scaled(image_width, split_chunks(pixel_data), factor)
+
+
+
+def segment_pixel_count(input_name: str, input_size: int, start: int, stop: int) -> int:
+    """
+    counts pixels defined by bytes [start, stop) of pixel data in shared memory block with given name;
+    worker function of decode_parallel()
+    """
+    from multiprocessing import shared_memory
+
+    input_memory = shared_memory.SharedMemory(name=input_name)
+    data: np.ndarray = np.ndarray((input_size,), dtype=np.uint8, buffer=input_memory.buf)[start:stop]
+    pixel_count: int = int(scan_runs(data)[1].sum())
+    del data # release buffer before closing shared memory
+    input_memory.close()
+    return pixel_count
+
+
+
+def decode_segment(input_name: str, input_size: int, start: int, stop: int,
+                   output_name: str, output_size: int, pixel_offset: int) -> None:
+    """
+    decodes bytes [start, stop) of pixel data in shared memory block with given input name
+    into its slice starting at pixel_offset of shared memory block with given output name;
+    worker function of decode_parallel()
+    """
+    from multiprocessing import shared_memory
+
+    input_memory = shared_memory.SharedMemory(name=input_name)
+    output_memory = shared_memory.SharedMemory(name=output_name)
+    data: np.ndarray = np.ndarray((input_size,), dtype=np.uint8, buffer=input_memory.buf)[start:stop]
+    output: np.ndarray = np.ndarray((output_size,), dtype=np.uint8, buffer=output_memory.buf)
+    color_positions, counts = scan_runs(data)
+    output[pixel_offset:pixel_offset + counts.sum()] = np.repeat(COLOR_LUT[data[color_positions]], counts)
+    del data, output # release buffers before closing shared memory
+    input_memory.close()
+    output_memory.close()
+
+
+
+def segment_bounds(pixel_data, segments: int) -> list[int]:
+    """
+    splits pixel data into given amount of segments of about equal size
+    that can be decoded independently: segments always start directly after a color byte,
+    so a pxcount byte at a segment edge stays together with its color byte
+
+    Return byte offsets of segment boundaries (including 0 and the end of the pixel data)
+    """
+    data: np.ndarray = np.frombuffer(pixel_data, dtype=np.uint8)
+    bounds: list[int] = [0]
+    for segment in range(1, segments):
+        bound: int = max(bounds[-1], len(data) * segment // segments)
+        while 0 < bound < len(data) and STANDARD.is_pxcount(int(data[bound - 1])):
+            bound += 1
+        bounds.append(bound)
+    bounds.append(len(data))
+    return bounds
+
+
+
+def get_parallel_pool(workers: int) -> "ProcessPoolExecutor":
+    """
+    Return process pool with given amount of workers for decode_parallel(), kept in PARALLEL_POOL
+    so its processes are only started once per process (a pool of another size is shut down)
+    """
+    global PARALLEL_POOL
+    from concurrent.futures import ProcessPoolExecutor
+
+    if PARALLEL_POOL is None or PARALLEL_POOL[0] != workers:
+        if PARALLEL_POOL is not None:
+            PARALLEL_POOL[1].shutdown()
+        logging.debug(f"starting decode pool of {workers} processes")
+        PARALLEL_POOL = (workers, ProcessPoolExecutor(max_workers=workers))
+    return PARALLEL_POOL[1]
+
+
+
+def parallel_workers(workers: int, data_size: int) -> int:
+    """
+    Return amount of worker processes worth decoding given amount of bytes of pixel data with (at most given amount);
+    1 (decoding in this process) below PARALLEL_MIN_SIZE, and never more than there are CPUs,
+    as the processes would only compete for them on top of the cost of copying the data between them
+    """
+    if workers <= 1 or data_size < PARALLEL_MIN_SIZE:
+        return 1
+    cpus: int = cpu_count() or 1
+    if workers > cpus:
+        logging.warning(f"only decoding with {cpus} instead of {workers} workers, there are no more CPUs")
+    return min(workers, cpus)
+
+
+
+@contextmanager
+def parallel_output(size: int) -> "Iterator[shared_memory.SharedMemory]":
+    """
+    creates shared memory block of given size for decode_parallel() to decode into for the duration of a with block;
+    arrays created from it must not be used afterwards (if they are still alive, the block is only unlinked)
+    """
+    from multiprocessing import shared_memory
+
+    output_memory = shared_memory.SharedMemory(create=True, size=max(1, size))
+    try:
+        yield output_memory
+    finally:
+        try:
+            output_memory.close()
+        except BufferError:
+            logging.debug(f"shared memory block {output_memory.name} still in use, not closing it")
+        output_memory.unlink()
+
+
+
+def decode_parallel(image_width: int, pixel_data, workers: int, executor: "Executor | None" = None,
+                    output: "shared_memory.SharedMemory | None" = None) -> np.ndarray[tuple[int, int], np.dtype[np.uint8]]:
+    """
+    decodes pixel data encoded following the standard defined at https://github.com/DevLung/DerLungRLE)
+    into a 2D NumPy array of pixel luminance values using given amount of worker processes;
+    the workers first count the pixels of their segment, the prefix sum of which gives every segment's
+    output offset, then decode their segment into their slice of a shared output buffer
+
+    image_width
+      width of image in pixels
+    pixel_data
+      DerLungRLE-encoded pixel data (any object supporting the buffer protocol)
+    workers
+      amount of segments decoded in parallel
+    executor=None
+      executor running the workers; the process pool of get_parallel_pool() if None
+    output=None
+      shared memory block (see parallel_output()) owned by the caller; if it holds height * width bytes,
+      the returned array is a view of it instead of a copy, which must not be used after the block is closed
+
+    Return array of pixel luminance values with shape (height, width)
+    """
+    from multiprocessing import shared_memory
+
+    logging.debug(f"decoding {len(pixel_data)} bytes of pixel data with width={image_width} ({workers} workers)")
+
+    executor = get_parallel_pool(workers) if executor is None else executor
+    bounds: list[int] = segment_bounds(pixel_data, workers)
+    input_memory = shared_memory.SharedMemory(create=True, size=max(1, len(pixel_data)))
+    output_memory: shared_memory.SharedMemory | None = None # created if there is no (large enough) output block
+    try:
+        input_memory.buf[:len(pixel_data)] = pixel_data
+        counts: list[int] = list(executor.map(segment_pixel_count,
+                                              [input_memory.name] * workers, [len(pixel_data)] * workers,
+                                              bounds[:-1], bounds[1:]))
+        offsets: list[int] = [0, *np.cumsum(counts).tolist()]
+        height: int = max(1, -(-offsets[-1] // image_width))
+        if output is None or output.size < height * image_width:
+            output_memory = shared_memory.SharedMemory(create=True, size=height * image_width)
+        target: shared_memory.SharedMemory = output if output_memory is None else output_memory
+        list(executor.map(decode_segment,
+                          [input_memory.name] * workers, [len(pixel_data)] * workers, bounds[:-1], bounds[1:],
+                          [target.name] * workers, [height * image_width] * workers, offsets[:-1]))
+
+        pixels: np.ndarray = np.ndarray((height * image_width,), dtype=np.uint8, buffer=target.buf)
+        if output_memory is not None:
+            pixels = pixels.copy()
+        pixels[offsets[-1]:] = COLOR_LUT[0b0000_0000] # extend last row with black pixels
+        return pixels.reshape(height, image_width)
+    finally:
+        input_memory.close()
+        input_memory.unlink()
+        if output_memory is not None:
+            output_memory.close()
+            output_memory.unlink()
+
+
+
+def decode_image(image_width: int, pixel_data, engine: str | None = None, cached: bool = False,
+                 workers: int | None = None, output: "shared_memory.SharedMemory | None" = None
+                 ) -> np.ndarray[tuple[int, int], np.dtype[np.uint8]]:
+    """
+    decodes pixel data into a 2D NumPy array of pixel luminance values using the given decode engine
+
+    engine=None
+      'numpy' for decode_array() (or decode_parallel() with more than one worker),
+      'python' for the reference implementation decode();
+      uses the engine selected via argv if None
+    workers=None
+      amount of worker processes for the numpy engine (see parallel_workers()); uses the amount selected via argv if None
+    output=None
+      shared memory block decode_parallel() decodes into (see there), if it is used
+    cached=False
+      look up and store the result in IMAGE_CACHE, keyed by a digest of the pixel data
+      (the returned array is read-only then)
+
+    Raise AssertionError if engine is invalid
+    """
+    engine = ENGINE if engine is None else engine
+    assert engine in ENGINES, LANG.Error.INVALID_ENGINE
+
+    if cached:
+        key: tuple[int, bytes] = imagecache.data_key(image_width, pixel_data)
+        pixels: np.ndarray | None = IMAGE_CACHE.get(key)
+        if pixels is None:
+            pixels = decode_image(image_width, pixel_data, engine, workers=workers)
+            IMAGE_CACHE.put(key, pixels)
+        return pixels
+
+    workers = parallel_workers(WORKERS if workers is None else workers, len(pixel_data))
+    with PROFILER.stage("decode", byte_count=len(pixel_data)) as record:
+        if engine == "python":
+            pixel_list: list[list[int]] = decode(image_width, pixel_data)
+        elif workers > 1:
+            pixels = decode_parallel(image_width, pixel_data, workers, output=output)
+        else:
+            pixels = decode_array(image_width, pixel_data)
+        record["pixels"] = len(pixel_list) * image_width if engine == "python" else pixels.size
+    if engine == "python":
+        with PROFILER.stage("array conversion", pixels=len(pixel_list) * image_width):
+            pixels = np.array(pixel_list, dtype=np.uint8)
+    return pixels
+
+
+
+def load_image(image_path, engine: str | None = None) -> np.ndarray[tuple[int, int], np.dtype[np.uint8]]:
+    """
+    gets and decodes image file at given path into a read-only 2D NumPy array of pixel luminance values,
+    using IMAGE_CACHE and DISK_CACHE (if enabled; a hit is memory-mapped) keyed by the file's path, modification time and size
+
+    Raise AssertionError if file is too short, if width is 0 or if engine is invalid
+    """
+    key: tuple[str, int, int] = imagecache.file_key(image_path)
+    pixels: np.ndarray | None = IMAGE_CACHE.get(key)
+    if pixels is not None:
+        logging.debug(f"loaded {image_path} from cache")
+        return pixels
+    if DISK_CACHE is not None:
+        with PROFILER.stage("read") as record:
+            pixels = DISK_CACHE.get(key)
+            record["pixels"] = pixels.size if pixels is not None else 0
+        if pixels is not None:
+            logging.debug(f"loaded {image_path} from disk cache")
+            IMAGE_CACHE.put(key, pixels)
+            return pixels
+
+    with open_image_data(image_path) as image_data:
+        pixels = decode_image(*image_data.values(), engine=engine)
+    IMAGE_CACHE.put(key, pixels)
+    if DISK_CACHE is not None:
+        with PROFILER.stage("write", byte_count=pixels.nbytes):
+            DISK_CACHE.put(key, pixels)
+    logging.debug(f"image cache: {IMAGE_CACHE.stats()}")
+    return pixels
+
+
+
+def encode_runs(colors: np.ndarray, lengths: np.ndarray) -> np.ndarray[tuple[int], np.dtype[np.uint8]]:
+    """
+    encodes runs of color bytes following the standard defined at https://github.com/DevLung/DerLungRLE),
+    splitting runs longer than the maximum pxcount into multiple pxcount-color-pairs
+    and emitting single pixels as bare color bytes;
+    splitting into as many full pairs as possible is already the cheapest split
+    (a run needs at least that many pairs and only a remainder of 1 pixel can drop its pxcount byte)
+
+    colors
+      color byte of each run
+    lengths
+      length of each run in pixels (>0)
+
+    Return array of encoded pixel data bytes
+    """
+    lengths = np.asarray(lengths, dtype=np.int64)
+    colors = np.asarray(colors, dtype=np.uint8)
+    chunk_lengths: np.ndarray = lengths
+    chunk_colors: np.ndarray = colors
+    if len(lengths) > 0 and lengths.max() > STANDARD.MAX_PXCOUNT:
+        full_chunks: np.ndarray = lengths // STANDARD.MAX_PXCOUNT
+        remainders: np.ndarray = lengths % STANDARD.MAX_PXCOUNT
+        chunk_amounts: np.ndarray = full_chunks + (remainders > 0)
+
+        # every chunk of a run is as long as the maximum pxcount except for the last one, which holds the remainder
+        chunk_lengths = np.full(chunk_amounts.sum(), STANDARD.MAX_PXCOUNT, dtype=np.int64)
+        last_chunks: np.ndarray = np.cumsum(chunk_amounts) - 1
+        chunk_lengths[last_chunks[remainders > 0]] = remainders[remainders > 0]
+        chunk_colors = np.repeat(colors, chunk_amounts)
+
+    # single pixels don't need a pxcount byte
+    chunk_sizes: np.ndarray = np.where(chunk_lengths == 1, 1, 2)
+    chunk_ends: np.ndarray = np.cumsum(chunk_sizes)
+    encoded: np.ndarray = np.empty(chunk_ends[-1] if len(chunk_ends) else 0, dtype=np.uint8)
+    repeated: np.ndarray = chunk_lengths > 1
+    encoded[chunk_ends[repeated] - 2] = 0b1000_0000 | chunk_lengths[repeated]
+    encoded[chunk_ends - 1] = chunk_colors
+    return encoded
+
+
+
+def encoded_size(lengths: np.ndarray) -> int:
+    """Return size in bytes of runs of given lengths encoded with encode_runs(), without encoding them"""
+    full_chunks, remainders = np.divmod(np.asarray(lengths, dtype=np.int64), STANDARD.MAX_PXCOUNT)
+    return int((2 * full_chunks).sum() + np.count_nonzero(remainders == 1) + 2 * np.count_nonzero(remainders > 1))
+
+
+
+def trimmed_length(pixels: np.ndarray, image_width: int) -> int:
+    """
+    Return amount of pixels of given flat array of color bytes that need to be encoded:
+    black pixels at the end of the last row are dropped (the decoder pads the last row with black),
+    but at least one pixel of the last row is kept so that the row count stays the same
+    """
+    last_row: np.ndarray = pixels[len(pixels) - image_width:]
+    defined: np.ndarray = np.flatnonzero(last_row != 0b0000_0000)
+    return len(pixels) - len(last_row) + (int(defined[-1]) + 1 if len(defined) > 0 else 1)
+
+
+
+def row_encoded_size(pixels: np.ndarray[tuple[int, int], np.dtype[np.uint8]]) -> int:
+    """Return size in bytes of the pixel data of given 2D array of color bytes encoded naively, row by row"""
+    flat: np.ndarray = pixels.ravel()
+    run_start: np.ndarray = np.ones(len(flat), dtype=bool)
+    run_start[1:] = flat[1:] != flat[:-1]
+    run_start[::pixels.shape[1]] = True # every row starts a new run
+    return encoded_size(np.diff(np.flatnonzero(run_start), append=len(flat)))
+
+
+
+def find_runs(pixels: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    finds runs of equal values in given flat array
+
+    Return value and length of each run
+    """
+    run_starts: np.ndarray = np.flatnonzero(pixels[1:] != pixels[:-1]) + 1
+    run_starts = np.concatenate(([0], run_starts)) if len(pixels) > 0 else run_starts
+    lengths: np.ndarray = np.diff(run_starts, append=len(pixels))
+    return pixels[run_starts], lengths
+
+
+
+def to_grayscale_array(image: "Image.Image | np.ndarray") -> np.ndarray[tuple[int, int], np.dtype[np.uint8]]:
+    """
+    converts PIL Image object or array-like to a 2D uint8 array of luminance values
+
+    Raise AssertionError if image is not 2D or empty
+    """
+    from PIL import Image
+
+    if isinstance(image, Image.Image):
+        image = image.convert("L")
+    pixels: np.ndarray = np.asarray(image)
+    assert pixels.ndim == 2, LANG.Error.INVALID_IMAGE_SHAPE
+    assert pixels.size > 0, LANG.Error.IMAGE_EMPTY
+    if pixels.dtype != np.uint8:
+        pixels = np.clip(pixels, 0, 0b1111_1111).astype(np.uint8)
+    return pixels
+
+
+
+def encode(image: "Image.Image | np.ndarray", optimize: bool = False) -> bytes:
+    """
+    encodes image following the standard defined at https://github.com/DevLung/DerLungRLE)
+    after quantizing its luminance values to the 7-bit color space;
+    runs are detected across the whole flattened pixel stream, so they may span rows
+
+    image
+      PIL Image object or 2D array of uint8 luminance values
+    optimize=False
+      minimize output size by dropping black pixels at the end of the last row (see trimmed_length())
+
+    Return encoded file data (header and pixel data)
+
+    Raise AssertionError if image is not 2D, empty or too wide
+    """
+    pixels: np.ndarray = to_grayscale_array(image)
+    logging.debug(f"encoding {pixels.shape[0]} rows of {pixels.shape[1]} pixels")
+
+    with PROFILER.stage("encode", pixels=pixels.size) as record:
+        header: bytes = STANDARD.encode_width(pixels.shape[1])
+        quantized: np.ndarray = QUANTIZE_LUT[pixels.ravel()]
+        if optimize:
+            quantized = quantized[:trimmed_length(quantized, pixels.shape[1])]
+        colors, lengths = find_runs(quantized)
+        data: bytes = header + encode_runs(colors, lengths).tobytes()
+        record["bytes"] = len(data)
+    return data
+
+
+
+# characters of all uint8 luminance values for each render style, index with luminance to render
+CHARACTER_LUT: np.ndarray = np.where(np.arange(0b1_0000_0000) > 0b1111_1111 / 2, WHITE_PIXEL, BLACK_PIXEL)
+SHADE_LUT: np.ndarray = np.array(list(SHADES))[np.arange(0b1_0000_0000) * len(SHADES) // 0b1_0000_0000]
+# half block characters of all pairs of top and bottom luminance levels, index with 2 * (top pixel is white) + (bottom pixel is white)
+# or top level * len(GRAYSCALE_COLORS) + bottom level for shading (foreground color for top half, background color for bottom half)
+HALF_BLOCK_LUT: np.ndarray = np.array(HALF_BLOCKS)
+SHADED_HALF_BLOCK_LUT: np.ndarray = np.array([f"\x1b[38;5;{top}m\x1b[48;5;{bottom}m{HALF_BLOCKS[2]}"
+                                              for top in GRAYSCALE_COLORS for bottom in GRAYSCALE_COLORS])
+ANSI_RESET = "\x1b[0m"
+
+
+
+def render_pixels(pixels: np.ndarray, half_blocks: bool = False, shading: bool = False) -> str:
+    """
+    renders 2D array of pixel luminance values into text for the terminal in one go
+
+    half_blocks=False
+      render two rows of pixels per line using half block characters
+    shading=False
+      render grayscale shades instead of black/white only
+      (ANSI 256-color grayscale with half blocks, shade characters otherwise)
+
+    Return rendered lines separated by newlines
+    """
+    pixels = np.asarray(pixels, dtype=np.uint8)
+    if half_blocks:
+        if len(pixels) % 2 == 1: # pair last row with black pixels
+            pixels = np.vstack((pixels, np.full((1, pixels.shape[1]), COLOR_LUT[0b0000_0000], dtype=np.uint8)))
+        top, bottom = pixels[0::2], pixels[1::2]
+        if shading:
+            levels: int = len(GRAYSCALE_COLORS)
+            cells: np.ndarray = SHADED_HALF_BLOCK_LUT[(top.astype(np.int64) * levels // 0b1_0000_0000) * levels
+                                                      + bottom.astype(np.int64) * levels // 0b1_0000_0000]
+        else:
+            cells = HALF_BLOCK_LUT[2 * (top > 0b1111_1111 / 2) + (bottom > 0b1111_1111 / 2)]
+    else:
+        cells = (SHADE_LUT if shading else CHARACTER_LUT)[pixels]
+
+    # view every row of equally long cell strings as a single string
+    lines: np.ndarray = np.ascontiguousarray(cells).view(f"<U{cells.dtype.itemsize // 4 * cells.shape[1]}")
+    line_end: str = ANSI_RESET + "\n" if half_blocks and shading else "\n"
+    return line_end.join(lines.ravel().tolist()) + line_end
+
+
+
+def downscale(pixels: np.ndarray, factor: int) -> np.ndarray[tuple[int, int], np.dtype[np.uint8]]:
+    """Return 2D array of pixel luminance values downscaled by given integer factor, averaging each factor x factor box"""
+    if factor <= 1:
+        return pixels
+    rows: np.ndarray = np.add.reduceat(pixels.astype(np.uint32), np.arange(0, pixels.shape[0], factor), axis=0)
+    boxes: np.ndarray = np.add.reduceat(rows, np.arange(0, pixels.shape[1], factor), axis=1)
+    # boxes at the bottom and right edges may be smaller
+    heights: np.ndarray = np.diff(np.arange(0, pixels.shape[0], factor), append=pixels.shape[0])
+    widths: np.ndarray = np.diff(np.arange(0, pixels.shape[1], factor), append=pixels.shape[1])
+    return (boxes // np.outer(heights, widths)).astype(np.uint8)
+
+
+
+def fit_factor(image_width: int, image_height: int, half_blocks: bool = False) -> int:
+    """Return smallest integer downscale factor that fits an image of given size into the terminal"""
+    import shutil
+
+    columns, lines = shutil.get_terminal_size()
+    lines = max(1, lines - 1) * (2 if half_blocks else 1) # leave a line for the prompt
+    return max(1, -(-image_width // columns), -(-image_height // lines))
+
+
+
+def pixels_to_stdout(pixels: list[list[int]] | np.ndarray, half_blocks: bool = False, shading: bool = False) -> None:
+    """prints a given 2D array of pixel luminances to terminal in one write (see render_pixels())"""
     logging.debug(f"printing {len(pixels)} rows of {len(pixels[0])} pixels to stdout")
 
-    for row in pixels:
-        for pixel in row:
-            if pixel > 0b1111_1111 / 2:
-                print(WHITE_PIXEL, end="")
-                continue
-            print(BLACK_PIXEL, end="")
-        print() # newline
+    with PROFILER.stage("render", pixels=len(pixels) * len(pixels[0])):
+        text: str = render_pixels(pixels, half_blocks, shading)
+    with PROFILER.stage("write", byte_count=len(text)):
+        stdout.write(text)
 
 
 
@@ -137,7 +964,9 @@ def get_mode() -> str:
     """
     gets mode of operation from argv
 
-    Return 'DECODE' for decode, 'ENCODE' for encode, 'HELP' for help
+    Return 'DECODE' for decode, 'ENCODE' for encode, 'BATCH_DECODE'/'BATCH_ENCODE' for batch modes,
+    'INFO'/'VERIFY' for inspecting files, 'PACK_BUILD'/'PACK_LIST'/'PACK_EXTRACT'/'PACK_DECODE' for pack files,
+    'HELP' for help
 
     Raise AssertionError if no mode is supplied or if mode is invalid
     """
@@ -151,14 +980,212 @@ def get_mode() -> str:
             return "DECODE"
         case "-e" | "--encode":
             return "ENCODE"
+        case "-bd" | "--batch-decode":
+            return "BATCH_DECODE"
+        case "-be" | "--batch-encode":
+            return "BATCH_ENCODE"
+        case "-i" | "--info":
+            return "INFO"
+        case "-v" | "--verify":
+            return "VERIFY"
+        case "-pb" | "--pack-build":
+            return "PACK_BUILD"
+        case "-pl" | "--pack-list":
+            return "PACK_LIST"
+        case "-px" | "--pack-extract":
+            return "PACK_EXTRACT"
+        case "-pd" | "--pack-decode":
+            return "PACK_DECODE"
         case _:
             raise AssertionError(LANG.Error.INVALID_MODE)
 
 
 
+def get_option(option: str) -> str | None:
+    """Return parameter of given option from argv or None if option isn't supplied"""
+    if option in argv and argv.index(option) < len(argv) - 1:
+        return argv[argv.index(option) + 1]
+    return None
+
+
+
+def get_arguments(first_argv: int) -> list[str]:
+    """Return arguments from given argv index up to the first option"""
+    arguments: list[str] = []
+    for argument in argv[first_argv:]:
+        if argument.startswith("--"):
+            break
+        arguments.append(argument)
+    return arguments
+
+
+
+def get_batch_paths(first_argv: int = INPUT_PATH_ARGV, extensions: tuple[str, ...] | None = None) -> list[str]:
+    """
+    gets input file paths for batch, info, verify and pack build modes from argv
+    (all arguments from given index up to the first option);
+    directories are expanded to the files they contain, glob patterns to the paths they match
+
+    extensions=None
+      file extensions (lowercase, with dot) of the files taken from directories (all files if None)
+
+    Return input file paths
+
+    Raise AssertionError if no input path is supplied
+    """
+    logging.debug(f"getting batch input paths from argv[{first_argv}:]")
+
+    input_paths: list[str] = []
+    for argument in get_arguments(first_argv):
+        if path.isdir(argument):
+            input_paths.extend(path.abspath(path.join(argument, name)) for name in sorted(listdir(argument))
+                               if path.isfile(path.join(argument, name))
+                               and (extensions is None or path.splitext(name)[1].lower() in extensions))
+        elif glob.has_magic(argument):
+            input_paths.extend(path.abspath(match) for match in sorted(glob.glob(argument)) if path.isfile(match))
+        else:
+            input_paths.append(path.abspath(argument)) # missing files are reported as failures per file
+    assert len(input_paths) > 0, LANG.Error.NO_INPUT_FILES
+    return input_paths
+
+
+
+def readable_image_extensions() -> tuple[str, ...]:
+    """Return file extensions of all image formats Pillow can open (input files of batch encode mode)"""
+    from PIL import Image
+
+    return tuple(extension for extension, image_format in Image.registered_extensions().items() if image_format in Image.OPEN)
+
+
+
+def get_out_dir() -> str | None:
+    """
+    gets and validates output directory for batch modes from argv
+
+    Return output directory or None if option isn't supplied
+
+    Raise AssertionError if the output directory doesn't exist
+    """
+    out_dir: str | None = get_option(OUT_DIR_ARGV_OPTION)
+    if out_dir is None:
+        return None
+    assert path.isdir(out_dir), LANG.Error.INVALID_OUTPUT_PATH
+    return path.abspath(out_dir)
+
+
+
+def get_engine() -> str:
+    """
+    gets decode engine from argv (first of ENGINES if option isn't supplied)
+
+    Raise AssertionError if engine is invalid
+    """
+    logging.debug(f"getting decode engine from {ENGINE_ARGV_OPTION} option")
+
+    engine: str = (get_option(ENGINE_ARGV_OPTION) or ENGINES[0]).lower()
+    assert engine in ENGINES, LANG.Error.INVALID_ENGINE
+    return engine
+
+
+
+def get_workers() -> int:
+    """
+    gets amount of worker processes from argv (1 if option isn't supplied)
+
+    Raise AssertionError if amount is not a positive integer
+    """
+    logging.debug(f"getting amount of workers from {WORKERS_ARGV_OPTION} option")
+
+    if WORKERS_ARGV_OPTION not in argv:
+        return 1
+    assert argv.index(WORKERS_ARGV_OPTION) < len(argv) - 1, LANG.Error.INVALID_WORKERS
+    workers: str = argv[argv.index(WORKERS_ARGV_OPTION) + 1]
+    assert workers.isdecimal() and int(workers) > 0, LANG.Error.INVALID_WORKERS
+    return int(workers)
+
+
+
+def get_rows() -> tuple[int, int] | None:
+    """
+    gets row range to decode from argv as START:STOP (None if option isn't supplied)
+
+    Raise AssertionError if range is not two integers with 0 <= START < STOP
+    """
+    logging.debug(f"getting row range from {ROWS_ARGV_OPTION} option")
+
+    if ROWS_ARGV_OPTION not in argv:
+        return None
+    row_range: list[str] = (get_option(ROWS_ARGV_OPTION) or "").split(":")
+    assert len(row_range) == 2 and all(row.isdecimal() for row in row_range), LANG.Error.INVALID_ROWS
+    start, stop = int(row_range[0]), int(row_range[1])
+    assert start < stop, LANG.Error.INVALID_ROWS
+    return start, stop
+
+
+
+def get_disk_cache() -> imagecache.DiskCache | None:
+    """
+    gets disk cache of decoded images selected via argv (directory and size in megabytes)
+
+    Return disk cache or None if option isn't supplied
+
+    Raise AssertionError if size is not a positive integer
+    """
+    directory: str | None = get_option(DISK_CACHE_ARGV_OPTION)
+    if directory is None:
+        return None
+    size: str = get_option(DISK_CACHE_SIZE_ARGV_OPTION) or str(DISK_CACHE_SIZE)
+    assert size.isdecimal() and int(size) > 0, LANG.Error.INVALID_CACHE_SIZE
+    logging.info(f"caching decoded images in {directory} (up to {size}MB)")
+    return imagecache.DiskCache(directory, int(size) * 1024 * 1024)
+
+
+
+def get_output_path(input_path: str) -> str:
+    """
+    gets and validates output file path (or STDIO_PATH for stdout) from argv,
+    defaults to DEFAULT_OUTPUT_NAME in the same directory as the given input path
+
+    Return output file path
+
+    Raise AssertionError if the directory of the output file path doesn't exist
+    """
+    logging.debug(f"getting output file path from argv[{OUTPUT_PATH_ARGV}]")
+
+    if len(argv) <= OUTPUT_PATH_ARGV or argv[OUTPUT_PATH_ARGV].startswith("--"):
+        return path.join(path.dirname(input_path), DEFAULT_OUTPUT_NAME)
+    if argv[OUTPUT_PATH_ARGV] == STDIO_PATH:
+        return STDIO_PATH
+    output_path: str = path.abspath(argv[OUTPUT_PATH_ARGV])
+    assert path.isdir(path.dirname(output_path)), LANG.Error.INVALID_OUTPUT_PATH
+    return output_path
+
+
+
+def get_pack_path(existing: bool) -> str:
+    """
+    gets and validates pack file path from argv (argument after the mode)
+
+    existing
+      the pack file is read (needs to exist) instead of written (its directory needs to exist)
+
+    Return pack file path
+
+    Raise AssertionError if pack file path is invalid
+    """
+    logging.debug(f"getting pack file path from argv[{INPUT_PATH_ARGV}]")
+
+    error_msg: str = LANG.Error.INVALID_INPUT_PATH if existing else LANG.Error.INVALID_OUTPUT_PATH
+    assert len(argv) > INPUT_PATH_ARGV and not argv[INPUT_PATH_ARGV].startswith("--"), error_msg
+    pack_path: str = path.abspath(argv[INPUT_PATH_ARGV])
+    assert path.isfile(pack_path) if existing else path.isdir(path.dirname(pack_path)), error_msg
+    return pack_path
+
+
+
 def get_file_path(argv_index: int) -> str:
     """
-    gets and validates file path from given argv index
+    gets and validates file path from given argv index (STDIO_PATH stands for stdin and is passed through)
 
     Return file path
 
@@ -168,6 +1195,8 @@ def get_file_path(argv_index: int) -> str:
 
     error_msg: str = LANG.Error.INVALID_OUTPUT_PATH if argv_index == OUTPUT_PATH_ARGV else LANG.Error.INVALID_INPUT_PATH
     assert len(argv) > argv_index, error_msg
+    if argv[argv_index] == STDIO_PATH:
+        return STDIO_PATH
     file_path: str = path.abspath(argv[argv_index])
     assert path.exists(file_path), error_msg
     return file_path
@@ -203,16 +1232,531 @@ def handle_critical_exception(function: Callable, *args, exception=Exception, st
 
 
 
-def decode_to_stdout(image_path) -> None:
+def decode_row_range(image_path, start: int, stop: int) -> np.ndarray[tuple[int, int], np.dtype[np.uint8]]:
+    """
+    decodes rows [start, stop) (clamped to the image height) of image file at given path (or STDIO_PATH for stdin),
+    only touching the pixel data they need (see rowindex.read_rows()); stdin is indexed in memory instead
+
+    Raise AssertionError if file is too short or if width is 0
+    """
+    import rowindex
+
+    if image_path != STDIO_PATH:
+        return rowindex.read_rows(image_path, start, stop)
+    with open_image_data(image_path) as image_data:
+        image_width, pixel_data = image_data.values()
+        return rowindex.decode_rows(pixel_data, rowindex.build_index(image_width, pixel_data), start, stop)
+
+
+
+def decode_to_stdout(image_path, fit: bool = False, half_blocks: bool = False, shading: bool = False,
+                     rows: tuple[int, int] | None = None) -> None:
     """
     displays image file at given path in terminal
     following the standard defined at https://github.com/DevLung/DerLungRLE)
+
+    fit=False
+      downscale image to fit into the terminal
+    half_blocks=False, shading=False
+      render style (see render_pixels())
+    rows=None
+      range of rows (start, stop) to display instead of the whole image (see decode_row_range())
     """
     logging.info(f"decoding {image_path} to stdout")
 
-    image_data: dict[str, int | bytes] = get_image_data(image_path)
-    pixels: list[list[int]] = decode(*image_data.values())
-    pixels_to_stdout(pixels)
+    if rows is not None:
+        pixels: np.ndarray = decode_row_range(image_path, *rows)
+        factor = fit_factor(pixels.shape[1], max(1, pixels.shape[0]), half_blocks) if fit else 1
+        pixels_to_stdout(downscale(pixels, factor), half_blocks, shading)
+        stdout.flush()
+        return
+
+    # memory-mapped pixel data (or all of stdin, which can only be read once) is decoded chunk by chunk
+    with open_image_data(image_path) as image_data:
+        image_width, pixel_data = image_data.values()
+        factor: int = 1
+        workers: int = 1 if ENGINE == "python" else parallel_workers(WORKERS, len(pixel_data))
+        if fit:
+            factor = fit_factor(image_width, max(1, -(-count_pixels(split_chunks(pixel_data)) // image_width)), half_blocks)
+            logging.debug(f"downscaling by factor {factor} to fit terminal")
+
+        if DISK_CACHE is not None and image_path != STDIO_PATH:
+            blocks: Iterable[np.ndarray] = [load_image(image_path)]
+        elif factor > 1 and ENGINE != "python":
+            # only the pixels shown are decoded (sampled instead of averaged)
+            blocks = [decode_scaled(image_width, split_chunks(pixel_data), factor)]
+            factor = 1
+        elif ENGINE == "python" or workers > 1:
+            blocks = [decode_image(image_width, pixel_data, workers=workers)]
+        else:
+            # blocks of whole downscaled (pairs of) rows
+            rows_per_block: int = factor * 2 * max(1, ROWS_PER_BLOCK // (factor * 2))
+            blocks = decode_stream(image_width, split_chunks(pixel_data), rows_per_block)
+        for pixels in blocks:
+            pixels_to_stdout(downscale(pixels, factor), half_blocks, shading)
+    stdout.flush()
+
+
+
+def export_header(export_format: str, image_width: int, image_height: int) -> bytes:
+    """Return header of an image of given size in given stream export format (see STREAM_EXPORT_FORMATS)"""
+    match export_format:
+        case "pgm":
+            return f"P5\n{image_width} {image_height}\n255\n".encode("ascii")
+        case "npy":
+            header = io.BytesIO()
+            np.lib.format.write_array_header_1_0(header, {"descr": "|u1", "fortran_order": False,
+                                                          "shape": (image_height, image_width)})
+            return header.getvalue()
+        case _:
+            return b""
+
+
+
+def check_export_format(export_format: str) -> None:
+    """Raise AssertionError if images can't be exported in given format (see export_pixels())"""
+    if export_format in STREAM_EXPORT_FORMATS or "." + export_format == ENCODED_EXTENSION:
+        return
+    from PIL import Image
+
+    assert Image.registered_extensions().get("." + export_format) in Image.SAVE, LANG.Error.INVALID_EXPORT_FORMAT
+
+
+
+def export_pixels(file: BinaryIO, blocks: Iterable[np.ndarray], image_width: int, image_height: int,
+                  export_format: str) -> None:
+    """
+    writes image given as consecutive blocks of rows to given open file in given export format:
+    formats in STREAM_EXPORT_FORMATS are written block by block as they come in,
+    ENCODED_EXTENSION re-encodes the image, any other format is saved by Pillow once all rows are there
+
+    Raise AssertionError if export format is not supported
+    """
+    logging.debug(f"exporting image of {image_width}x{image_height} pixels as {export_format}")
+
+    if export_format in STREAM_EXPORT_FORMATS:
+        file.write(export_header(export_format, image_width, image_height))
+        for rows in blocks:
+            with PROFILER.stage("write", byte_count=rows.nbytes):
+                file.write(rows.tobytes())
+        return
+
+    from PIL import Image
+
+    check_export_format(export_format)
+    pixels: np.ndarray = np.concatenate(list(blocks))
+    if "." + export_format == ENCODED_EXTENSION:
+        data: bytes = encode(pixels)
+        with PROFILER.stage("write", byte_count=len(data)):
+            file.write(data)
+        return
+    with PROFILER.stage("write", pixels=pixels.size):
+        Image.fromarray(pixels).save(file, format=Image.registered_extensions()["." + export_format])
+
+
+
+def get_export_format(output_path: str) -> str:
+    """Return export format selected via argv, the extension of given output path or DEFAULT_STDOUT_FORMAT for stdout"""
+    export_format: str | None = get_option(FORMAT_ARGV_OPTION)
+    if export_format is None:
+        export_format = DEFAULT_STDOUT_FORMAT if output_path == STDIO_PATH else path.splitext(output_path)[1][1:]
+    return export_format.lower()
+
+
+
+def decode_to_file(image_path, output_path, export_format: str, rows: tuple[int, int] | None = None) -> None:
+    """
+    decodes image file at given path (or STDIO_PATH for stdin) and exports it
+    to a file at given output path (or STDIO_PATH for stdout) in given format (see export_pixels());
+    stream export formats are written as rows are decoded, so the decoded image is never held in memory as a whole
+    (unless DISK_CACHE is enabled, which caches whole images)
+
+    rows=None
+      range of rows (start, stop) to export instead of the whole image (see decode_row_range())
+
+    Raise AssertionError if export format is not supported
+    """
+    logging.info(f"decoding {image_path} to {output_path} ({export_format})")
+
+    check_export_format(export_format)
+    if rows is not None or (DISK_CACHE is not None and image_path != STDIO_PATH):
+        pixels: np.ndarray = decode_row_range(image_path, *rows) if rows is not None else load_image(image_path)
+        with open(stdout.fileno() if output_path == STDIO_PATH else output_path, "wb",
+                  closefd=output_path != STDIO_PATH) as file:
+            export_pixels(file, [pixels], pixels.shape[1], pixels.shape[0], export_format)
+        return
+
+    with open_image_data(image_path) as image_data:
+        image_width, pixel_data = image_data.values()
+        image_height: int = max(1, -(-count_pixels(split_chunks(pixel_data)) // image_width))
+
+        with open(stdout.fileno() if output_path == STDIO_PATH else output_path, "wb",
+                  closefd=output_path != STDIO_PATH) as file:
+            workers: int = 1 if ENGINE == "python" else parallel_workers(WORKERS, len(pixel_data))
+            if workers > 1:
+                # decoded right into shared memory instead of being copied out of it
+                with parallel_output(image_width * image_height) as output:
+                    export_pixels(file, [decode_image(image_width, pixel_data, workers=workers, output=output)],
+                                  image_width, image_height, export_format)
+                return
+            if ENGINE == "python":
+                blocks: Iterable[np.ndarray] = [decode_image(image_width, pixel_data)]
+            else:
+                blocks = decode_stream(image_width, split_chunks(pixel_data))
+            export_pixels(file, blocks, image_width, image_height, export_format)
+
+
+
+def encode_to_file(input_path, output_path, optimize: bool = False) -> None:
+    """
+    encodes image file at given input path (any format supported by Pillow, STDIO_PATH for stdin)
+    into a file at given output path (STDIO_PATH for stdout)
+    following the standard defined at https://github.com/DevLung/DerLungRLE)
+
+    optimize=False
+      minimize output size (see encode()) and print the size compared to a naive row by row encoding
+    """
+    from PIL import Image
+
+    logging.info(f"encoding {input_path} to {output_path}")
+
+    with PROFILER.stage("read"), Image.open(stdin.buffer if input_path == STDIO_PATH else input_path) as image:
+        image.load()
+    data: bytes = encode(image, optimize)
+    with PROFILER.stage("write", byte_count=len(data)), open(stdout.fileno() if output_path == STDIO_PATH else output_path, "wb",
+                                                        closefd=output_path != STDIO_PATH) as file:
+        file.write(data)
+    logging.debug(f"wrote {len(data)} bytes of image data")
+
+    if optimize:
+        pixel_data_size: int = len(data) - STANDARD.HEADER_SIZE
+        row_size: int = row_encoded_size(QUANTIZE_LUT[to_grayscale_array(image)])
+        print(LANG.Info.ENCODE_SIZE.format(size=len(data), row_size=row_size + STANDARD.HEADER_SIZE,
+                                           ratio=row_size / pixel_data_size),
+              file=stderr if output_path == STDIO_PATH else stdout)
+
+
+
+
+
+
+def batch_output_path(mode: str, input_path: str, out_dir: str | None, export_format: str) -> str:
+    """Return output path of given input file in given batch mode: same name with new extension in out_dir (or next to input file)"""
+    extension: str = "." + export_format.lower() if mode == "BATCH_DECODE" else ENCODED_EXTENSION
+    name: str = path.splitext(path.basename(input_path))[0] + extension
+    return path.join(out_dir if out_dir is not None else path.dirname(input_path), name)
+
+
+
+def transcode_file(mode: str, input_path: str, output_path: str, optimize: bool = False) -> dict[str, Any]:
+    """
+    decodes and exports or encodes (optimized for size if optimize is set, see encode()) a single file of a batch,
+    catching any exception; worker function of run_batch()
+
+    Return result as dict containing
+      "input_path", "output_path": file paths
+      "bytes": size of input file
+      "pixels": amount of pixels transcoded
+      "seconds": wall time
+      "error": exception message or None if transcoding succeeded
+    """
+    from PIL import Image
+
+    result: dict[str, Any] = {"input_path": input_path, "output_path": output_path,
+                              "bytes": 0, "pixels": 0, "seconds": 0.0, "error": None}
+    start: float = time.perf_counter()
+    try:
+        result["bytes"] = path.getsize(input_path)
+        if mode == "BATCH_DECODE":
+            with open_image_data(input_path) as image_data:
+                pixels: np.ndarray = decode_image(*image_data.values(), workers=1)
+            with open(output_path, "wb") as file:
+                export_pixels(file, [pixels], pixels.shape[1], pixels.shape[0], path.splitext(output_path)[1][1:].lower())
+        else:
+            with Image.open(input_path) as image:
+                pixels = to_grayscale_array(image)
+            with open(output_path, "wb") as file:
+                file.write(encode(pixels, optimize))
+        result["pixels"] = pixels.size
+    except Exception as ex:
+        logging.exception(ex)
+        result["error"] = str(ex) or repr(ex)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+
+def run_batch(mode: str, input_paths: list[str], out_dir: str | None = None,
+              export_format: str = DEFAULT_EXPORT_FORMAT, workers: int | None = None,
+              optimize: bool = False) -> list[dict[str, Any]]:
+    """
+    decodes and exports ('BATCH_DECODE') or encodes ('BATCH_ENCODE') given files
+    spread across a pool of worker processes, reporting every file's result as soon as it's finished
+    and the overall throughput at the end; failures are collected per file
+
+    out_dir=None
+      directory to write output files to (next to input files if None)
+    export_format=DEFAULT_EXPORT_FORMAT
+      file format (extension) of decoded files
+    workers=None
+      amount of worker processes (number of CPUs if None)
+    optimize=False
+      minimize size of encoded files (see encode())
+
+    Return list of result dicts as returned by transcode_file() in the order the files were finished
+
+    Raise AssertionError if there are no input files (that aren't written by this batch)
+    or if two files would be written to the same output file
+    """
+    from concurrent.futures import ProcessPoolExecutor, Future, as_completed
+
+    # output files among the input files (e.g. written by an earlier run into the same directory) are skipped
+    written_paths: set[str] = {path.normcase(path.abspath(batch_output_path(mode, input_path, out_dir, export_format)))
+                               for input_path in input_paths}
+    input_paths = [input_path for input_path in input_paths if path.normcase(path.abspath(input_path)) not in written_paths]
+    assert len(input_paths) > 0, LANG.Error.NO_INPUT_FILES
+    output_paths: list[str] = [batch_output_path(mode, input_path, out_dir, export_format) for input_path in input_paths]
+    unique_paths: set[str] = {path.normcase(path.abspath(output_path)) for output_path in output_paths}
+    assert len(unique_paths) == len(output_paths), LANG.Error.DUPLICATE_OUTPUT_PATH
+    workers = workers or cpu_count() or 1
+    logging.info(f"running {mode} of {len(input_paths)} files with {workers} workers")
+
+    results: list[dict[str, Any]] = []
+    start: float = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures: list[Future] = [executor.submit(transcode_file, mode, input_path, output_path, optimize)
+                                 for input_path, output_path in zip(input_paths, output_paths)]
+        for future in as_completed(futures):
+            result: dict[str, Any] = future.result()
+            if result["error"] is None:
+                print(LANG.Info.BATCH_FILE_DONE.format(**result))
+            else:
+                print(LANG.Info.BATCH_FILE_FAILED.format(**result), file=stderr)
+            results.append(result)
+    seconds: float = time.perf_counter() - start
+
+    done: list[dict[str, Any]] = [result for result in results if result["error"] is None]
+    summary: dict[str, Any] = {
+        "done": len(done),
+        "total": len(results),
+        "seconds": seconds,
+        "files_per_second": len(done) / seconds,
+        "mb_per_second": sum(result["bytes"] for result in done) / seconds / 1e6,
+        "pixels_per_second": sum(result["pixels"] for result in done) / seconds
+    }
+    print(LANG.Info.BATCH_SUMMARY.format(**summary))
+    logging.info(f"batch summary: {summary}")
+    return results
+
+
+
+def histogram_buckets(histogram: np.ndarray) -> list[tuple[int, int, int]]:
+    """Return (shortest length, longest length, amount of runs) of given run length histogram in buckets of powers of two"""
+    buckets: list[tuple[int, int, int]] = []
+    shortest: int = 1
+    while shortest < len(histogram):
+        longest: int = min(2 * shortest, len(histogram)) - 1
+        buckets.append((shortest, longest, int(histogram[shortest:longest + 1].sum())))
+        shortest *= 2
+    return buckets
+
+
+
+def inspect_file(image_path) -> dict[str, Any]:
+    """
+    scans structure of DerLungRLE file at given path without decoding it (see scan_structure())
+
+    Return scan result
+
+    Raise AssertionError if the file is too short or its width is 0
+    """
+    with open_image_data(image_path) as image_data, PROFILER.stage("scan", byte_count=len(image_data["pxdata"])) as record:
+        result: dict[str, Any] = scan_structure(*image_data.values())
+        record["pixels"] = result["pixels"]
+    logging.debug(f"scanned {image_path}: { {key: value for key, value in result.items() if key != 'histogram'} }")
+    return result
+
+
+
+def inspect_files(mode: str, input_paths: list[str]) -> bool:
+    """
+    prints size, pixel count, padding, compression ratio and run length histogram ('INFO')
+    or only anomalies ('VERIFY') of given DerLungRLE files; unreadable files are reported and skipped
+
+    Return if all files could be read and contain no anomalies
+    """
+    all_valid: bool = True
+    for input_path in input_paths:
+        try:
+            result: dict[str, Any] = inspect_file(input_path)
+        except (AssertionError, OSError, ValueError) as ex:
+            logging.exception(ex)
+            print(LANG.Info.BATCH_FILE_FAILED.format(input_path=input_path, error=str(ex) or repr(ex)), file=stderr)
+            all_valid = False
+            continue
+        all_valid = all_valid and result["valid"]
+
+        if mode == "INFO":
+            print(LANG.Info.INFO_SUMMARY.format(input_path=input_path, **result))
+            print(LANG.Info.INFO_HISTOGRAM.format(buckets=", ".join(
+                f"{shortest}-{longest}: {runs}" for shortest, longest, runs in histogram_buckets(result["histogram"])
+            )))
+            if not result["valid"]:
+                print(LANG.Info.INFO_ANOMALIES.format(**result))
+        elif result["valid"]:
+            print(LANG.Info.VERIFY_VALID.format(input_path=input_path))
+        else:
+            print(LANG.Info.VERIFY_INVALID.format(input_path=input_path), file=stderr)
+            print(LANG.Info.INFO_ANOMALIES.format(**result), file=stderr)
+    return all_valid
+
+
+
+def build_pack_file(pack_path, input_paths: list[str]) -> None:
+    """
+    packs DerLungRLE files at given paths into a pack file at given path (see pack.py)
+
+    Raise AssertionError if a file is too short, its width is 0 or two files have the same name
+    """
+    import pack
+
+    index: list[tuple[str, int, int, int]] = pack.build_pack(pack_path, input_paths, LANG)
+    print(LANG.Info.PACK_BUILT.format(images=len(index), pack_path=pack_path, bytes=path.getsize(pack_path)))
+
+
+
+def list_pack(pack_path) -> None:
+    """
+    prints name, width, size and offset of every image in pack file at given path (read from its index only)
+
+    Raise AssertionError if the file is not a pack file
+    """
+    import pack
+
+    with pack.Pack(pack_path, LANG) as image_pack:
+        for name, offset, length, width in zip(image_pack.names, image_pack.offsets, image_pack.lengths, image_pack.widths):
+            print(LANG.Info.PACK_MEMBER.format(name=name, width=width, bytes=length + STANDARD.HEADER_SIZE, offset=offset))
+
+
+
+def iter_pack(pack_path, members: list[str | int] | None = None) -> Iterator[tuple[str, np.ndarray[tuple[int, int], np.dtype[np.uint8]]]]:
+    """
+    decodes images of pack file at given path one after another, reading only their own pixel data from the memory-mapped pack
+
+    members=None
+      names (or positions) of images to decode (all images in the order of the index if None)
+
+    Return iterator over name and array of pixel luminance values of each image
+
+    Raise AssertionError if the file is not a pack file or if it doesn't contain an image
+    """
+    import pack
+
+    with pack.Pack(pack_path, LANG) as image_pack:
+        for position in [image_pack.position(member) for member in members or range(len(image_pack))]:
+            yield image_pack.names[position], decode_image(*image_pack.image_data(position).values())
+
+
+
+def extract_pack(pack_path, members: list[str], out_dir: str) -> None:
+    """
+    writes images of pack file at given path as DerLungRLE files (named after their images) into given directory,
+    copying their pixel data without decoding them
+
+    members
+      names of images to extract (all images if empty)
+
+    Raise AssertionError if the file is not a pack file or if it doesn't contain an image
+    """
+    import pack
+
+    with pack.Pack(pack_path, LANG) as image_pack:
+        for member in members or range(len(image_pack)):
+            position: int = image_pack.position(member)
+            image_width, pixel_data = image_pack.image_data(position).values()
+            output_path: str = path.join(out_dir, path.basename(image_pack.names[position]))
+            with open(output_path, "wb") as file, pixel_data: # memoryview released before the pack is closed
+                file.write(STANDARD.encode_width(image_width))
+                file.write(pixel_data)
+            print(LANG.Info.PACK_EXTRACTED.format(name=image_pack.names[position], output_path=output_path))
+
+
+
+def decode_pack(pack_path, members: list[str], out_dir: str, export_format: str) -> None:
+    """
+    decodes images of pack file at given path and exports them in given format
+    into given directory, reporting the overall throughput at the end
+
+    members
+      names of images to decode (all images if empty)
+
+    Raise AssertionError if the file is not a pack file, if it doesn't contain an image,
+    if two images would be exported to the same file or if the export format is not supported
+    """
+    import pack
+
+    check_export_format(export_format)
+    with pack.Pack(pack_path, LANG) as image_pack:
+        positions: list[int] = [image_pack.position(member) for member in members or range(len(image_pack))]
+        names: list[str] = [image_pack.names[position] for position in positions]
+        data_bytes: int = sum(image_pack.lengths[position] for position in positions)
+    output_paths: list[str] = [path.join(out_dir, path.splitext(path.basename(name))[0] + "." + export_format) for name in names]
+    assert len(set(output_paths)) == len(output_paths), LANG.Error.DUPLICATE_OUTPUT_PATH
+
+    pixel_count: int = 0
+    start: float = time.perf_counter()
+    for (name, pixels), output_path in zip(iter_pack(pack_path, positions), output_paths):
+        with open(output_path, "wb") as file:
+            export_pixels(file, [pixels], pixels.shape[1], pixels.shape[0], export_format)
+        print(LANG.Info.PACK_EXTRACTED.format(name=name, output_path=output_path))
+        pixel_count += pixels.size
+    seconds: float = time.perf_counter() - start
+
+    summary: dict[str, Any] = {
+        "done": len(positions),
+        "total": len(positions),
+        "seconds": seconds,
+        "files_per_second": len(positions) / seconds,
+        "mb_per_second": data_bytes / seconds / 1e6,
+        "pixels_per_second": pixel_count / seconds
+    }
+    print(LANG.Info.BATCH_SUMMARY.format(**summary))
+    logging.info(f"pack decode summary: {summary}")
+
+
+
+
+
+
+def get_language() -> lang.LanguagePack:
+    """Return language pack selected via argv (English (US) if none or an unknown one is selected)"""
+    language_code: str | None = get_option(LANG_ARGV_OPTION)
+    if language_code is None:
+        return lang.EnglishUS()
+    return lang.LANGUAGES.get(language_code.lower(), lang.EnglishUS)()
+
+
+
+def set_language(language: lang.LanguagePack) -> None:
+    """sets language of messages (LANG in global scope) and the standard using it (STANDARD in global scope)"""
+    global LANG, STANDARD
+
+    LANG = language
+    STANDARD = standard.DerLungRLE(language)
+    logging.info(f"language set to '{LANG.NATIVE_NAME}'")
+
+
+
+def setup_logging() -> None:
+    """configures logging to LOG_PATH (overwriting the log of the previous run), at debug level if requested via argv"""
+    logging.basicConfig(
+        level=logging.DEBUG if DEBUG_ARGV_OPTION in argv else logging.INFO,
+        format="[%(asctime)s] [%(levelname)s] [%(filename)s: %(lineno)d, in %(funcName)s]:  %(message)s",
+        datefmt="%d-%m-%Y %H:%M:%S",
+        encoding="utf-8",
+        filename=LOG_PATH,
+        filemode="w"
+    )
 
 
 
@@ -220,27 +1764,94 @@ def decode_to_stdout(image_path) -> None:
 
 
 def main() -> None:
+    global ENGINE, WORKERS, DISK_CACHE
+
+    setup_logging()
+    logging.info(f"__main__: {path.realpath(__file__)}")
+    set_language(get_language())
+    PROFILER.enabled = profiling.PROFILE_ARGV_OPTION in argv
     mode: str = handle_critical_exception(get_mode, exception=AssertionError)
+    ENGINE = handle_critical_exception(get_engine, exception=AssertionError)
+    WORKERS = handle_critical_exception(get_workers, exception=AssertionError)
+    DISK_CACHE = handle_critical_exception(get_disk_cache, exception=AssertionError)
     logging.info(f"running {mode}")
     match mode:
         case "HELP":
             print(LANG.Info.TRANSCODE_HELP)
         case "DECODE":
             input_path: str = handle_critical_exception(get_file_path, INPUT_PATH_ARGV, exception=AssertionError)
-            handle_critical_exception(decode_to_stdout, input_path, exception=AssertionError)
+            rows: tuple[int, int] | None = handle_critical_exception(get_rows, exception=AssertionError)
+            if len(argv) > OUTPUT_PATH_ARGV and not argv[OUTPUT_PATH_ARGV].startswith("--"):
+                output_path: str = handle_critical_exception(get_output_path, input_path, exception=AssertionError)
+                handle_critical_exception(decode_to_file, input_path, output_path, get_export_format(output_path), rows,
+                                          exception=AssertionError)
+            else:
+                handle_critical_exception(decode_to_stdout, input_path, FIT_ARGV_OPTION in argv,
+                                          HALF_BLOCKS_ARGV_OPTION in argv, SHADING_ARGV_OPTION in argv, rows,
+                                          exception=AssertionError)
         case "ENCODE":
-            raise NotImplementedError
+            input_path: str = handle_critical_exception(get_file_path, INPUT_PATH_ARGV, exception=AssertionError)
+            output_path: str = handle_critical_exception(get_output_path, input_path, exception=AssertionError)
+            handle_critical_exception(encode_to_file, input_path, output_path, OPTIMIZE_ARGV_OPTION in argv,
+                                      exception=AssertionError)
+        case "BATCH_DECODE" | "BATCH_ENCODE":
+            extensions: tuple[str, ...] = (ENCODED_EXTENSION,) if mode == "BATCH_DECODE" else readable_image_extensions()
+            input_paths: list[str] = handle_critical_exception(get_batch_paths, INPUT_PATH_ARGV, extensions,
+                                                               exception=AssertionError)
+            out_dir: str | None = handle_critical_exception(get_out_dir, exception=AssertionError)
+            export_format: str = (get_option(FORMAT_ARGV_OPTION) or DEFAULT_EXPORT_FORMAT).lower()
+            if mode == "BATCH_DECODE":
+                handle_critical_exception(check_export_format, export_format, exception=AssertionError)
+            workers: int | None = WORKERS if WORKERS_ARGV_OPTION in argv else None
+            results: list[dict[str, Any]] = handle_critical_exception(run_batch, mode, input_paths, out_dir, export_format,
+                                                                      workers, OPTIMIZE_ARGV_OPTION in argv,
+                                                                      exception=AssertionError)
+            if any(result["error"] is not None for result in results):
+                logging.error("Exiting with status code 1.")
+                exit(1)
+        case "PACK_BUILD":
+            pack_path: str = handle_critical_exception(get_pack_path, False, exception=AssertionError)
+            input_paths: list[str] = handle_critical_exception(get_batch_paths, OUTPUT_PATH_ARGV, (ENCODED_EXTENSION,),
+                                                               exception=AssertionError)
+            handle_critical_exception(build_pack_file, pack_path, input_paths, exception=AssertionError)
+        case "PACK_LIST":
+            pack_path: str = handle_critical_exception(get_pack_path, True, exception=AssertionError)
+            handle_critical_exception(list_pack, pack_path, exception=AssertionError)
+        case "PACK_EXTRACT" | "PACK_DECODE":
+            pack_path: str = handle_critical_exception(get_pack_path, True, exception=AssertionError)
+            out_dir: str | None = handle_critical_exception(get_out_dir, exception=AssertionError)
+            members: list[str] = get_arguments(OUTPUT_PATH_ARGV)
+            if mode == "PACK_EXTRACT":
+                handle_critical_exception(extract_pack, pack_path, members, out_dir or path.dirname(pack_path),
+                                          exception=AssertionError)
+            else:
+                handle_critical_exception(decode_pack, pack_path, members, out_dir or path.dirname(pack_path),
+                                          (get_option(FORMAT_ARGV_OPTION) or DEFAULT_EXPORT_FORMAT).lower(),
+                                          exception=AssertionError)
+        case "INFO" | "VERIFY":
+            input_paths: list[str] = handle_critical_exception(get_batch_paths, INPUT_PATH_ARGV, (ENCODED_EXTENSION,),
+                                                               exception=AssertionError)
+            if not inspect_files(mode, input_paths):
+                logging.error("Exiting with status code 1.")
+                exit(1)
 
+    logging.debug(f"image cache: {IMAGE_CACHE.stats()}")
+    if DISK_CACHE is not None:
+        logging.debug(f"disk cache: {DISK_CACHE.stats()}")
     logging.info("Exiting with status code 0.")
 
 
 if __name__ == "__main__":
     try:
-        logging.info(f"__main__: {path.realpath(__file__)}")
-        logging.info(f"language set to '{LANG.NATIVE_NAME}'")
-        main()
+        if get_option(profiling.CPROFILE_ARGV_OPTION) is not None:
+            profiling.run_cprofiled(main, get_option(profiling.CPROFILE_ARGV_OPTION))
+        else:
+            main()
     except Exception as ex:
         logging.critical(ex, exc_info=True)
         print(LANG.Error.UNEXPECTED_CRITICAL + f"\n({LANG.Error.EXCEPTION_PREFIX} {repr(ex)})", file=stderr)
         logging.critical("Exiting with status code 1.")
-        exit(1)
\ No newline at end of file
+        exit(1)
+    finally:
+        if PROFILER.enabled:
+            PROFILER.print_summary()
\ No newline at end of file
@@ -1,14 +1,20 @@
+from __future__ import annotations # annotations may name modules that are imported on first use
 import definitions.lang as lang
-import transcode
 from sys import argv, executable, stderr, exit
 from os import path
 import logging
-import numpy as np
-from PIL import Image, ImageTk
 import tkinter as tk
 from tkinter import filedialog, messagebox
-import inspect
 from subprocess import Popen
+from collections import OrderedDict
+from itertools import takewhile
+from typing import Generator
+import profiling
+from profiling import PROFILER
+import queue
+import threading
+import time
+from tkinter import ttk
 
 
 
@@ -16,8 +22,20 @@ from subprocess import Popen
 DEBUG_ARGV_OPTION = "--debug"
 LANG_ARGV_OPTION = "--lang"
 HELP_ARGV_OPTION = "-?"
+DISK_CACHE_ARGV_OPTIONS = ("--disk-cache", "--disk-cache-size") # read by transcode.get_disk_cache(), passed on when relaunching
 INPUT_PATH_ARGV = 1
 BG_COLOR = "#343a40"
+RESIZE_DEBOUNCE_MS = 150 # delay after the last resize event before rendering the exact image
+RENDER_CACHE_SIZE = 8 # amount of rendered image sizes to keep
+PREVIEW_SIZE = 256 # maximum width and height in pixels of the low quality preview shown while resizing
+DECODE_POLL_MS = 50 # interval of polling the background decoder for finished rows
+DECODE_REFRESH_MS = 250 # minimum interval of re-rendering a partially decoded image
+DECODE_ROWS_PER_BLOCK = 256 # rows handed back from the background decoder at once
+TILE_SIZE = 256 # width and height in screen pixels of rendered tiles of a zoomed image
+TILE_CACHE_SIZE = 512 # amount of rendered tiles to keep
+ZOOM_STEP = 1.25 # zoom factor per mouse wheel step
+MAX_ZOOM = 64.0 # maximum screen pixels per image pixel
+SAVE_FILE_TYPES = (("PNG", "*.png"), ("PGM", "*.pgm"), ("DerLungRLE", "*.bin"), ("NumPy", "*.npy"), ("Raw", "*.raw"), ("*", "*"))
 LOG_PATH: str = path.realpath(path.join(path.dirname(__file__), "debug.log"))
 logging.basicConfig(
     level=logging.INFO,
@@ -27,40 +45,119 @@ logging.basicConfig(
     filename=LOG_PATH,
     filemode="w"
 )
+PROFILER.enabled = profiling.PROFILE_ARGV_OPTION in argv
 if DEBUG_ARGV_OPTION in argv:
     logging.getLogger().setLevel(logging.DEBUG)
 LANG: lang.LanguagePack = lang.EnglishUS()
-# if there is enough argvs to fit lang option AND if option flag is supplied AND if there is another argv behind it
-if len(argv) > 2 and LANG_ARGV_OPTION in argv and argv.index(LANG_ARGV_OPTION) < len(argv) - 1:
-    for _, language in inspect.getmembers(lang, inspect.isclass):
-        if not language == lang.LanguagePack and language.LANGUAGE_CODE == argv[argv.index(LANG_ARGV_OPTION) + 1].lower():
-            LANG = language
+# if option flag is supplied AND if there is another argv behind it
+if LANG_ARGV_OPTION in argv and argv.index(LANG_ARGV_OPTION) < len(argv) - 1:
+    LANG = lang.LANGUAGES.get(argv[argv.index(LANG_ARGV_OPTION) + 1].lower(), lang.EnglishUS)()
 
 
 
 
 
 
-def fit_image(event: tk.Event) -> None:
+def import_image_modules() -> None:
     """
-    fits image into widget; bind to <Configure> event of widget to use
+    imports the modules needed to decode and render images (NumPy, Pillow, transcode) into global scope
+    and sets up the disk cache selected via argv (see transcode.get_disk_cache());
+    deferred until the first image is displayed, so the window shows up without waiting for them
 
-    needs a PIL Image object (image: Image.Image)
-    and a corresponding aspect ratio (image_ratio: float) in global scope
+    Raise AssertionError if the disk cache size is invalid
+    """
+    global np, Image, ImageTk, transcode, imagecache
+
+    import numpy as np
+    from PIL import Image, ImageTk
+    import transcode
+    import imagecache
+
+    transcode.set_language(LANG)
+    if transcode.DISK_CACHE is None:
+        transcode.DISK_CACHE = transcode.get_disk_cache()
+
+
+
+def show_rendered(rendered: ImageTk.PhotoImage, x: int, y: int, anchor: str = "center") -> None:
+    """
+    shows given rendered image at given canvas position,
+    reusing the canvas image item (canvas_image_item: int | None) in global scope
     """
+    global image_tk, canvas_image_item
+
+    image_tk = rendered # keep reference, otherwise the image is garbage collected
+    if canvas_image_item is None:
+        canvas_image_item = image_canvas.create_image(x, y, image=image_tk, anchor=anchor)
+        return
+    image_canvas.itemconfigure(canvas_image_item, image=image_tk, anchor=anchor)
+    image_canvas.coords(canvas_image_item, x, y)
+
+
+
+def render_exact(width: int, height: int, canvas_width: int, canvas_height: int) -> None:
+    """
+    renders full image at given size, caches it in rendered_images (OrderedDict) in global scope
+    (keeping the RENDER_CACHE_SIZE most recently used sizes) and shows it
+    """
+    global resize_job
+
+    resize_job = None
+    if image_canvas is None or not image_canvas.winfo_exists():
+        return
+    logging.debug(f"rendering image at {width}x{height}")
+
+    with PROFILER.stage("render", pixels=width * height):
+        rendered_images[(width, height)] = ImageTk.PhotoImage(image.resize((width, height), Image.Resampling.NEAREST))
+    if len(rendered_images) > RENDER_CACHE_SIZE:
+        rendered_images.popitem(last=False)
+    show_rendered(rendered_images[(width, height)], int(canvas_width / 2), int(canvas_height / 2))
+
 
-    global image_tk
 
-    canvas_ratio: float = event.width / event.height
+def fit_size(canvas_width: int, canvas_height: int) -> tuple[int, int]:
+    """Return largest size of image (image_ratio: float in global scope) that fits into a canvas of given size"""
+    canvas_ratio: float = canvas_width / canvas_height
     if canvas_ratio < image_ratio: # if canvas is narrower than image
-        width = int(event.width)
+        width = int(canvas_width)
         height = int(width / image_ratio)
     else:
-        height = int(event.height)
+        height = int(canvas_height)
         width = int(height * image_ratio)
+    return width, height
+
+
+
+def fit_image(event: tk.Event) -> None:
+    """
+    fits image into widget (or re-renders the viewport if zoomed); bind to <Configure> event of widget to use
+
+    shows a cached render of the new size if there is one; otherwise shows a cheap
+    low quality preview right away and renders the exact image once resizing stopped for RESIZE_DEBOUNCE_MS
+
+    needs a PIL Image object (image: Image.Image), its downscaled preview (preview_image: Image.Image)
+    and a corresponding aspect ratio (image_ratio: float) in global scope
+    """
+
+    global resize_job
+
+    if zoom is not None:
+        render_viewport()
+        return
+
+    width, height = fit_size(event.width, event.height)
+
+    if resize_job is not None:
+        window.after_cancel(resize_job)
+        resize_job = None
+
+    if (width, height) in rendered_images:
+        rendered_images.move_to_end((width, height))
+        show_rendered(rendered_images[(width, height)], int(event.width / 2), int(event.height / 2))
+        return
 
     try:
-        image_tk = ImageTk.PhotoImage(image.resize((width, height), Image.Resampling.NEAREST))
+        preview: ImageTk.PhotoImage = ImageTk.PhotoImage(preview_image.resize((width, height), Image.Resampling.NEAREST))
     except ValueError as ex:
         logging.exception(ex)
         close_image()
@@ -70,54 +167,283 @@ def fit_image(event: tk.Event) -> None:
         )
         return
 
-    image_canvas.create_image(
-        int(event.width / 2),
-        int(event.height / 2),
-        image=image_tk,
-        anchor="center")
+    show_rendered(preview, int(event.width / 2), int(event.height / 2))
+    resize_job = window.after(RESIZE_DEBOUNCE_MS, render_exact, width, height, event.width, event.height)
 
 
 
-def open_image(file_path) -> None:
+def get_tile(tile_x: int, tile_y: int) -> np.ndarray[tuple[int, int], np.dtype[np.uint8]]:
+    """
+    Return tile at given tile position of decoded image (decoded_pixels: np.ndarray in global scope)
+    scaled to current zoom level (zoom: float in global scope), sampling only the image pixels it shows;
+    tiles are cached in rendered_tiles (OrderedDict) in global scope per zoom level
     """
-    gets image file at given path, converts it to PIL Image object
-    and puts it (image: Image.Image) and its calculated aspect ratio (image_ratio: float) into global scope
+    key: tuple[float, int, int] = (zoom, tile_x, tile_y)
+    if key in rendered_tiles:
+        rendered_tiles.move_to_end(key)
+        return rendered_tiles[key]
+
+    zoomed_height, zoomed_width = int(decoded_pixels.shape[0] * zoom), int(decoded_pixels.shape[1] * zoom)
+    rows: np.ndarray = (np.arange(tile_y * TILE_SIZE, min((tile_y + 1) * TILE_SIZE, zoomed_height)) / zoom).astype(np.int64)
+    columns: np.ndarray = (np.arange(tile_x * TILE_SIZE, min((tile_x + 1) * TILE_SIZE, zoomed_width)) / zoom).astype(np.int64)
+    rendered_tiles[key] = decoded_pixels[np.ix_(rows, columns)]
+    if len(rendered_tiles) > TILE_CACHE_SIZE:
+        rendered_tiles.popitem(last=False)
+    return rendered_tiles[key]
+
 
-    Raise AssertionError if image path is invalid
+
+def render_viewport() -> None:
+    """
+    renders the visible part of the zoomed image from (cached) tiles and shows it on the canvas;
+    the viewport's top left corner (view_x: int, view_y: int in global scope) is given in zoomed image pixels
+    and is clamped so that the image stays in view (or centered if it's smaller than the canvas)
     """
-    logging.debug(f"opening image {file_path}")
+    global view_x, view_y
+
+    if image_canvas is None or not image_canvas.winfo_exists():
+        return
+    canvas_width, canvas_height = image_canvas.winfo_width(), image_canvas.winfo_height()
+    zoomed_height, zoomed_width = int(decoded_pixels.shape[0] * zoom), int(decoded_pixels.shape[1] * zoom)
+    view_x = min(max(view_x, 0), zoomed_width - canvas_width) if zoomed_width > canvas_width else -((canvas_width - zoomed_width) // 2)
+    view_y = min(max(view_y, 0), zoomed_height - canvas_height) if zoomed_height > canvas_height else -((canvas_height - zoomed_height) // 2)
+
+    # visible part of zoomed image
+    left, right = max(view_x, 0), min(view_x + canvas_width, zoomed_width)
+    top, bottom = max(view_y, 0), min(view_y + canvas_height, zoomed_height)
+    if right <= left or bottom <= top:
+        return
+
+    with PROFILER.stage("render", pixels=(bottom - top) * (right - left)):
+        rendered: ImageTk.PhotoImage = render_tiles(left, right, top, bottom)
+    show_rendered(rendered, left - view_x, top - view_y, anchor="nw")
+
+
+
+def render_tiles(left: int, right: int, top: int, bottom: int) -> ImageTk.PhotoImage:
+    """Return given area (in zoomed image pixels) of the zoomed image assembled from (cached) tiles"""
+    viewport: np.ndarray = np.empty((bottom - top, right - left), dtype=np.uint8)
+    for tile_y in range(top // TILE_SIZE, (bottom - 1) // TILE_SIZE + 1):
+        for tile_x in range(left // TILE_SIZE, (right - 1) // TILE_SIZE + 1):
+            tile: np.ndarray = get_tile(tile_x, tile_y)
+            tile_left, tile_top = tile_x * TILE_SIZE, tile_y * TILE_SIZE
+            x0, x1 = max(left, tile_left), min(right, tile_left + tile.shape[1])
+            y0, y1 = max(top, tile_top), min(bottom, tile_top + tile.shape[0])
+            viewport[y0 - top:y1 - top, x0 - left:x1 - left] = tile[y0 - tile_top:y1 - tile_top, x0 - tile_left:x1 - tile_left]
+
+    return ImageTk.PhotoImage(Image.fromarray(viewport))
+
+
+
+def zoom_image(event: tk.Event) -> None:
+    """
+    zooms image in or out by ZOOM_STEP around the mouse pointer; bind to mouse wheel events of widget to use;
+    zooming out below the size that fits into the canvas returns to fitting the image
+    """
+    global zoom, view_x, view_y
+
+    zoom_in: bool = event.num == 4 or event.delta > 0
+    fitting_zoom: float = fit_size(image_canvas.winfo_width(), image_canvas.winfo_height())[0] / decoded_pixels.shape[1]
+    if zoom is None:
+        if not zoom_in:
+            return
+        zoom = fitting_zoom
+        view_x = -((image_canvas.winfo_width() - int(decoded_pixels.shape[1] * zoom)) // 2)
+        view_y = -((image_canvas.winfo_height() - int(decoded_pixels.shape[0] * zoom)) // 2)
+
+    new_zoom: float = min(zoom * ZOOM_STEP, MAX_ZOOM) if zoom_in else zoom / ZOOM_STEP
+    if new_zoom <= fitting_zoom:
+        reset_zoom()
+        return
+    logging.debug(f"zooming to {new_zoom}")
+
+    # keep image pixel under mouse pointer in place
+    view_x = int((view_x + event.x) / zoom * new_zoom) - event.x
+    view_y = int((view_y + event.y) / zoom * new_zoom) - event.y
+    zoom = new_zoom
+    render_viewport()
+
+
+
+def start_pan(event: tk.Event) -> None:
+    """remembers mouse pointer position at the start of panning; bind to <ButtonPress-1> event of widget to use"""
+    global pan_start
+
+    pan_start = (event.x, event.y)
+
+
+
+def pan_image(event: tk.Event) -> None:
+    """moves viewport of zoomed image with the mouse pointer; bind to <B1-Motion> event of widget to use"""
+    global view_x, view_y, pan_start
+
+    if zoom is None:
+        return
+    view_x -= event.x - pan_start[0]
+    view_y -= event.y - pan_start[1]
+    pan_start = (event.x, event.y)
+    render_viewport()
+
+
 
-    global image, image_ratio
+def reset_zoom(event: tk.Event | None = None) -> None:
+    """returns to fitting the whole image into the canvas; bind to <Double-Button-1> event of widget to use"""
+    global zoom
 
-    assert path.exists(file_path), LANG.Error.INVALID_INPUT_PATH
+    logging.debug("resetting zoom")
+    zoom = None
+    rendered_tiles.clear()
+    render_fitted()
 
-    image_data: dict[str, int | bytes] = transcode.get_image_data(file_path)
-    pixel_list: list[list[int]] = transcode.decode(*image_data.values())
 
-    pixels: np.ndarray[tuple[int, ...], np.dtype[np.uint8]] = np.array(pixel_list, dtype=np.uint8)
-    image = Image.fromarray(pixels)
+
+def set_image(pixels: np.ndarray[tuple[int, ...], np.dtype[np.uint8]]) -> None:
+    """
+    wraps given C-contiguous array of pixel luminance values in a PIL Image object sharing its memory
+    (so rows written into the array later show up without converting it again)
+    and puts it (image: Image.Image), its preview of every preview_step-th row and column
+    (preview_image: Image.Image, preview_step: int) and its calculated aspect ratio (image_ratio: float) into global scope
+    """
+    global image, preview_image, preview_step, image_ratio
+
+    with PROFILER.stage("array conversion", pixels=pixels.size):
+        image = Image.frombuffer("L", (pixels.shape[1], pixels.shape[0]), pixels, "raw", "L", 0, 1)
+        preview_step = max(1, -(-max(pixels.shape) // PREVIEW_SIZE))
+        preview_image = Image.fromarray(np.ascontiguousarray(pixels[::preview_step, ::preview_step]))
     image_ratio = image.width / image.height
-    logging.debug(f"calculated image ratio: {image_ratio}")
 
 
 
-def display_image(image_path) -> None:
+def update_rows(top: int, bottom: int) -> None:
     """
-    calls open_image(image_path) (--> Raise AssertionError of image path is invalid)
-    and displays live-fitting image on canvas
+    updates the preview (preview_image: Image.Image) and drops the rendered tiles of rows [top, bottom)
+    of the decoded image (decoded_pixels: np.ndarray in global scope), which image already shares
     """
-    logging.info(f"displaying image {image_path}")
+    first: int = -(-top // preview_step) * preview_step # first preview row in range
+    if first < bottom:
+        rows: np.ndarray = np.ascontiguousarray(decoded_pixels[first:bottom:preview_step, ::preview_step])
+        preview_image.paste(Image.fromarray(rows), (0, first // preview_step))
 
-    global image_canvas
+    for key in [key for key in rendered_tiles
+                if int(key[2] * TILE_SIZE / key[0]) < bottom and int(((key[2] + 1) * TILE_SIZE - 1) / key[0]) >= top]:
+        del rendered_tiles[key]
 
-    open_image(image_path)
 
-    if image_canvas is not None:
-        logging.debug("destroying old image canvas")
-        image_canvas.destroy()
+
+def decode_worker(file_path, messages: queue.Queue, cancel: threading.Event) -> None:
+    """
+    decodes image file at given path in a background thread, posting messages to given queue:
+      ("cached", array) instead of all others if the image is in the memory or disk cache
+      ("size", width, height) once the image size is known
+      ("preview", factor, array) of every factor-th row and column of large images (see transcode.decode_scaled())
+      ("rows", first row, array of rows) for every block of finished rows
+      ("done",) when the image is complete
+      ("error", exception) if decoding failed
+    stops as soon as possible if given cancel event is set
+    """
+    logging.debug(f"decoding {file_path} in background")
+
+    streams: list[Generator[bytes, None, None]] = [] # chunk generators closed at the end, keeping their files open until then
+    try:
+        key: tuple[str, int, int] = imagecache.file_key(file_path)
+        cached: np.ndarray | None = transcode.IMAGE_CACHE.get(key)
+        if cached is None and transcode.DISK_CACHE is not None:
+            cached = transcode.DISK_CACHE.get(key) # memory-mapped
+        if cached is not None:
+            messages.put(("cached", cached))
+            return
+
+        pixel_count: int = 0
+        image_width, chunks = transcode.stream_image_data(file_path)
+        streams.append(chunks)
+        for _, _, counts in transcode.scan_stream(chunks):
+            if cancel.is_set():
+                return
+            pixel_count += int(counts.sum())
+        image_height: int = max(1, -(-pixel_count // image_width))
+        messages.put(("size", image_width, image_height))
+
+        # whole image at low resolution first, only sampling the pixels it shows
+        factor: int = max(-(-image_width // PREVIEW_SIZE), -(-image_height // PREVIEW_SIZE))
+        if factor > 1:
+            image_width, chunks = transcode.stream_image_data(file_path)
+            streams.append(chunks)
+            # stops reading once cancelled, the incomplete preview is dropped below
+            preview: np.ndarray = transcode.decode_scaled(image_width, takewhile(lambda _: not cancel.is_set(), chunks), factor)
+            if cancel.is_set():
+                logging.debug(f"cancelled previewing {file_path}")
+                return
+            messages.put(("preview", factor, preview))
+
+        if cancel.is_set():
+            logging.debug(f"cancelled decoding {file_path}")
+            return
+        first_row: int = 0
+        image_width, chunks = transcode.stream_image_data(file_path)
+        streams.append(chunks)
+        for rows in transcode.decode_stream(image_width, chunks, DECODE_ROWS_PER_BLOCK):
+            if cancel.is_set():
+                logging.debug(f"cancelled decoding {file_path}")
+                return
+            messages.put(("rows", first_row, rows))
+            first_row += len(rows)
+        messages.put(("done",))
+    except Exception as ex:
+        logging.exception(ex)
+        messages.put(("error", ex))
+    finally:
+        for chunks in streams: # closes the files of cancelled decodes right away instead of at garbage collection
+            chunks.close()
+
+
+
+def render_fitted() -> None:
+    """renders image fitted into the current canvas size right away"""
+    if image_canvas is None or not image_canvas.winfo_exists() or image_canvas.winfo_width() <= 1:
+        return # canvas not laid out yet, fit_image() renders once it is
+    try:
+        render_exact(*fit_size(image_canvas.winfo_width(), image_canvas.winfo_height()),
+                     image_canvas.winfo_width(), image_canvas.winfo_height())
+    except ValueError as ex: # image too small to display, fit_image() reports it
+        logging.exception(ex)
+
+
+
+def refresh_image() -> None:
+    """
+    re-renders partially decoded image (decoded_pixels: np.ndarray in global scope) at the current canvas size,
+    only updating the rows decoded since the last refresh (dirty_rows: tuple[int, int] in global scope)
+    """
+    global last_refresh, dirty_rows
+
+    last_refresh = time.perf_counter()
+    if dirty_rows[0] < dirty_rows[1]:
+        with PROFILER.stage("array conversion", pixels=(dirty_rows[1] - dirty_rows[0]) * decoded_pixels.shape[1]):
+            update_rows(*dirty_rows)
+    dirty_rows = (decoded_pixels.shape[0], 0)
+    rendered_images.clear()
+    if zoom is not None:
+        render_viewport()
+        return
+    render_fitted()
+
+
+
+def show_canvas() -> None:
+    """displays live-fitting, zoomable image (image: Image.Image in global scope) on new canvas"""
+    global image_canvas, canvas_image_item, zoom
+
+    canvas_image_item = None
+    zoom = None
     logging.debug("displaying image on new image canvas")
     image_canvas = tk.Canvas(window, bg=BG_COLOR, highlightthickness=0)
     image_canvas.bind("<Configure>", fit_image)
+    image_canvas.bind("<MouseWheel>", zoom_image) # Windows, macOS
+    image_canvas.bind("<Button-4>", zoom_image) # X11 wheel up
+    image_canvas.bind("<Button-5>", zoom_image) # X11 wheel down
+    image_canvas.bind("<ButtonPress-1>", start_pan)
+    image_canvas.bind("<B1-Motion>", pan_image)
+    image_canvas.bind("<Double-Button-1>", reset_zoom)
     image_canvas.pack(expand=True, fill="both")
     # enable "Save as...", "Close" buttons in file menu
     file_menu.entryconfigure(2, state="normal")
@@ -125,6 +451,127 @@ def display_image(image_path) -> None:
 
 
 
+def poll_decode() -> None:
+    """
+    hands the preview and rows finished by the background decoder to the main thread: fills them into the decoded image,
+    updates the progress bar and re-renders the image at most every DECODE_REFRESH_MS;
+    reschedules itself every DECODE_POLL_MS until decoding is finished
+    """
+    global decode_job, decoded_pixels, refresh_pending, dirty_rows, cache_writer
+
+    decode_job = None
+    finished: bool = False
+    while not finished:
+        try:
+            message: tuple = decode_messages.get_nowait()
+        except queue.Empty:
+            break
+
+        match message:
+            case ("cached", pixels):
+                logging.info("loaded image from cache")
+                decoded_pixels = pixels
+                set_image(decoded_pixels)
+                show_canvas()
+                finished = True
+                refresh_pending = True
+                transcode.IMAGE_CACHE.put(decoded_key, decoded_pixels)
+            case ("size", width, height):
+                logging.debug(f"decoding image of {width}x{height} pixels")
+                decoded_pixels = np.full((height, width), transcode.COLOR_LUT[0b0000_0000], dtype=np.uint8)
+                set_image(decoded_pixels)
+                dirty_rows = (height, 0)
+                show_canvas()
+                progress_bar.configure(maximum=height, value=0)
+            case ("preview", factor, preview):
+                logging.debug(f"showing preview downscaled by factor {factor}")
+                height, width = decoded_pixels.shape
+                decoded_pixels[:] = preview.repeat(factor, axis=0)[:height].repeat(factor, axis=1)[:, :width]
+                dirty_rows = (0, height)
+                refresh_pending = True
+            case ("rows", first_row, rows):
+                decoded_pixels[first_row:first_row + len(rows)] = rows
+                dirty_rows = (min(dirty_rows[0], first_row), max(dirty_rows[1], first_row + len(rows)))
+                progress_bar.configure(value=first_row + len(rows))
+                refresh_pending = True
+            case ("done",):
+                logging.info("finished decoding image")
+                finished = True
+                transcode.IMAGE_CACHE.put(decoded_key, decoded_pixels)
+                if transcode.DISK_CACHE is not None: # written in background, the window doesn't wait for it
+                    finish_cache_write()
+                    cache_writer = threading.Thread(target=transcode.DISK_CACHE.put, args=(decoded_key, decoded_pixels))
+                    cache_writer.start()
+            case ("error", ex):
+                cancel_decode()
+                if image_canvas is not None:
+                    close_image()
+                messagebox.showerror(LANG.Error.GENERIC_ERROR, f"{LANG.Error.EXCEPTION_PREFIX} {ex}")
+                return
+
+    if refresh_pending and (finished or time.perf_counter() - last_refresh >= DECODE_REFRESH_MS / 1000):
+        refresh_pending = False
+        refresh_image()
+    if finished:
+        progress_bar.pack_forget()
+        return
+    decode_job = window.after(DECODE_POLL_MS, poll_decode)
+
+
+
+def finish_cache_write() -> None:
+    """waits until the decoded image written to the disk cache in background (if any) is complete"""
+    global cache_writer
+
+    if cache_writer is not None:
+        logging.debug("waiting for disk cache write")
+        cache_writer.join()
+        cache_writer = None
+
+
+
+def cancel_decode() -> None:
+    """cancels decoding running in background (if any) and hides progress bar"""
+    global decode_job
+
+    decode_cancel.set()
+    if decode_job is not None:
+        window.after_cancel(decode_job)
+        decode_job = None
+    progress_bar.pack_forget()
+
+
+
+def display_image(image_path) -> None:
+    """
+    starts decoding image file at given path in background and displays live-fitting image on canvas,
+    filling it in progressively from the top as rows are decoded
+
+    Raise AssertionError if image path or disk cache size is invalid
+    """
+    logging.info(f"displaying image {image_path}")
+
+    global decode_messages, decode_cancel, decoded_key, refresh_pending, dirty_rows
+
+    assert path.exists(image_path), LANG.Error.INVALID_INPUT_PATH
+    import_image_modules()
+
+    cancel_decode()
+    if image_canvas is not None:
+        logging.debug("destroying old image canvas")
+        close_image()
+
+    decode_messages = queue.Queue()
+    decode_cancel = threading.Event()
+    decoded_key = imagecache.file_key(image_path)
+    refresh_pending = False
+    dirty_rows = (0, 0)
+    progress_bar.pack(side="bottom", fill="x")
+    threading.Thread(target=decode_worker, args=(image_path, decode_messages, decode_cancel), daemon=True).start()
+    poll_decode()
+
+
+
 def open_image_dialog() -> None:
     file_path: str = filedialog.askopenfilename()
     try:
@@ -135,14 +582,40 @@ def open_image_dialog() -> None:
 
 
 def save_image() -> None:
-    raise NotImplementedError
+    """
+    exports the decoded image (decoded_pixels: np.ndarray in global scope) to a file selected in a dialog,
+    in the format given by its extension (see transcode.export_pixels())
+    """
+    if decode_job is not None:
+        messagebox.showinfo(*LANG.Error.IMAGE_NOT_DECODED)
+        return
+    file_path: str = filedialog.asksaveasfilename(defaultextension=".png", filetypes=SAVE_FILE_TYPES)
+    if not file_path:
+        return
+    logging.info(f"saving image as {file_path}")
+
+    try:
+        export_format: str = path.splitext(file_path)[1][1:].lower()
+        transcode.check_export_format(export_format)
+        with open(file_path, "wb") as file:
+            transcode.export_pixels(file, [decoded_pixels], decoded_pixels.shape[1], decoded_pixels.shape[0], export_format)
+    except (AssertionError, OSError) as ex:
+        logging.exception(ex)
+        messagebox.showerror(LANG.Error.GENERIC_ERROR, f"{LANG.Error.EXCEPTION_PREFIX} {ex}")
 
 
 
 def close_image() -> None:
-    global image_canvas
+    global resize_job
 
     logging.info("closing currently displayed image")
+    cancel_decode()
+    if resize_job is not None:
+        window.after_cancel(resize_job)
+        resize_job = None
+    rendered_images.clear()
+    rendered_tiles.clear()
+    logging.debug(f"image cache: {transcode.IMAGE_CACHE.stats()}")
     image_canvas.destroy()
     # disable "Save as...", "Close" buttons in file menu
     file_menu.entryconfigure(2, state="disabled")
@@ -156,9 +629,15 @@ def change_language() -> None:
         logging.debug("Selected language is currently loaded, doing nothing.")
         return
 
-    Popen((executable, # interpreter path
-        path.realpath(__file__), # this script's path
-        LANG_ARGV_OPTION, selected_language.get())) # selected language as argv
+    arguments: list[str] = [executable, path.realpath(__file__)] # interpreter path, this script's path
+    if image_canvas is not None and image_canvas.winfo_exists():
+        arguments.append(decoded_key[0]) # reopen displayed image (from the disk cache if enabled)
+    arguments += [LANG_ARGV_OPTION, selected_language.get()] # selected language as argv
+    for option in DISK_CACHE_ARGV_OPTIONS:
+        if option in argv and argv.index(option) < len(argv) - 1:
+            arguments += [option, argv[argv.index(option) + 1]]
+    finish_cache_write() # the relaunched viewer reopens the image from the disk cache
+    Popen(arguments)
     window.quit()
 
 
@@ -197,24 +676,45 @@ try:
     options_menu.add_cascade(label=LANG.Label.LANGUAGE_SELECT, menu=language_select)
     selected_language = tk.StringVar(window, value=LANG.LANGUAGE_CODE)
     # add all available languages to menu
-    for _, language in inspect.getmembers(lang, inspect.isclass):
-        if not language == lang.LanguagePack:
-            language_select.add_radiobutton(label=language.NATIVE_NAME,
-                                            value=language.LANGUAGE_CODE,
-                                            variable=selected_language,
-                                            command=change_language)
+    for language in lang.LANGUAGES.values():
+        language_select.add_radiobutton(label=language.NATIVE_NAME,
+                                        value=language.LANGUAGE_CODE,
+                                        variable=selected_language,
+                                        command=change_language)
 
 
 
     image_canvas: tk.Canvas | None = None
+    canvas_image_item: int | None = None
+    image_tk: ImageTk.PhotoImage
     image: Image.Image
+    preview_image: Image.Image
+    preview_step: int
     image_ratio: float
+    rendered_images: OrderedDict[tuple[int, int], ImageTk.PhotoImage] = OrderedDict()
+    resize_job: str | None = None
+    zoom: float | None = None # screen pixels per image pixel, None if image is fitted into canvas
+    view_x: int = 0
+    view_y: int = 0
+    pan_start: tuple[int, int] = (0, 0)
+    rendered_tiles: OrderedDict[tuple[float, int, int], np.ndarray] = OrderedDict()
+
+    progress_bar = ttk.Progressbar(window, mode="determinate")
+    decode_messages: queue.Queue = queue.Queue()
+    decode_cancel: threading.Event = threading.Event()
+    decode_job: str | None = None
+    decoded_pixels: np.ndarray
+    decoded_key: tuple[str, int, int]
+    refresh_pending: bool = False
+    dirty_rows: tuple[int, int] = (0, 0) # rows [top, bottom) decoded since the last refresh (empty if top >= bottom)
+    last_refresh: float = 0.0
+    cache_writer: threading.Thread | None = None
 
 
 
     try:
-        file_path: str = transcode.get_file_path(INPUT_PATH_ARGV)
-        display_image(file_path)
+        assert len(argv) > INPUT_PATH_ARGV, LANG.Error.INVALID_INPUT_PATH
+        display_image(path.abspath(argv[INPUT_PATH_ARGV]))
     except AssertionError as ex:
         logging.info("can't find an image supplied via argv (so the following error can probably be ignored)")
         logging.exception(ex)
@@ -226,7 +726,12 @@ try:
 
 
 
-    window.mainloop()
+    if profiling.CPROFILE_ARGV_OPTION in argv and argv.index(profiling.CPROFILE_ARGV_OPTION) < len(argv) - 1:
+        profiling.run_cprofiled(window.mainloop, argv[argv.index(profiling.CPROFILE_ARGV_OPTION) + 1])
+    else:
+        window.mainloop()
+    if PROFILER.enabled:
+        PROFILER.print_summary()
     logging.info("Exiting with status code 0.")
 
 